@@ -0,0 +1,253 @@
+"""
+Upstream clients for the /llms assistant.
+
+One httpx connection pool is opened at startup and shared by the LLM client and
+web search, so requests reuse keep-alive connections and never block the event loop.
+"""
+import asyncio
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+import httpx
+from dotenv import load_dotenv
+from langchain_openai import ChatOpenAI
+
+import database
+from cache import TTLCache
+from metrics import register_cache, track_upstream
+
+load_dotenv()
+
+LLM_MODEL = os.getenv("LLM_MODEL", "z-ai/glm-4.5-air:free")
+LLM_BASE_URL = "https://openrouter.ai/api/v1"
+SERPER_URL = "https://google.serper.dev/search"
+
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+SEARCH_TIMEOUT_SECONDS = float(os.getenv("SEARCH_TIMEOUT_SECONDS", "10"))
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", "8"))
+SEARCH_CONCURRENCY = int(os.getenv("SEARCH_CONCURRENCY", "8"))
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "32"))
+SEARCH_CACHE_TTL_SECONDS = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", "900"))
+SEARCH_CACHE_MAX_SIZE = int(os.getenv("SEARCH_CACHE_MAX_SIZE", "512"))
+LLM_CACHE_TTL_SECONDS = float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400"))
+LLM_CACHE_MEMORY_SIZE = int(os.getenv("LLM_CACHE_MEMORY_SIZE", "256"))
+LLM_CACHE_MAX_ENTRY_BYTES = int(os.getenv("LLM_CACHE_MAX_ENTRY_BYTES", str(64 * 1024)))
+
+_http: httpx.AsyncClient | None = None
+_llm: ChatOpenAI | None = None
+_llm_slots = asyncio.Semaphore(LLM_CONCURRENCY)
+_search_slots = asyncio.Semaphore(SEARCH_CONCURRENCY)
+
+# search results keyed by normalized query, plus the upstream calls currently in flight
+search_cache = TTLCache(max_size=SEARCH_CACHE_MAX_SIZE, ttl=SEARCH_CACHE_TTL_SECONDS)
+_search_inflight: Dict[str, asyncio.Task] = {}
+search_coalesced = 0
+
+# completions keyed by a hash of model and prompt: memory in front of the llm_cache collection
+llm_cache = TTLCache(max_size=LLM_CACHE_MEMORY_SIZE, ttl=LLM_CACHE_TTL_SECONDS)
+llm_cache_db_hits = 0
+
+register_cache("search", search_cache)
+register_cache("llm", llm_cache)
+
+
+async def startup():
+    global _http, _llm
+    _http = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_CONNECTIONS,
+        ),
+        timeout=httpx.Timeout(SEARCH_TIMEOUT_SECONDS),
+    )
+
+    api_key = os.getenv("OPENROUTER_API_KEY")
+    if api_key:
+        _llm = ChatOpenAI(
+            model=LLM_MODEL,
+            api_key=api_key,
+            base_url=LLM_BASE_URL,
+            timeout=LLM_TIMEOUT_SECONDS,
+            http_async_client=_http,
+        )
+
+
+async def shutdown():
+    global _http, _llm
+    if _http is not None:
+        await _http.aclose()
+    _http = None
+    _llm = None
+
+
+def llm_cache_key(prompt: str) -> str:
+    # the prompt already carries the attached context and any search results
+    return hashlib.sha256(f"{LLM_MODEL}\0{prompt}".encode()).hexdigest()
+
+
+async def get_cached_response(key: str) -> str | None:
+    global llm_cache_db_hits
+    response = llm_cache.get(key)
+    if response is not None:
+        return response
+
+    doc = await database.get_db()["llm_cache"].find_one({
+        "_id": key,
+        "expires_at": {"$gt": datetime.utcnow()},
+    })
+    if doc is None:
+        return None
+
+    llm_cache_db_hits += 1
+    llm_cache.set(key, doc["response"])
+    return doc["response"]
+
+
+async def store_response(key: str, response: str):
+    if len(response.encode()) > LLM_CACHE_MAX_ENTRY_BYTES:
+        return
+
+    llm_cache.set(key, response)
+    # expires_at carries a TTL index, so Mongo removes stale entries on its own
+    await database.get_db()["llm_cache"].update_one(
+        {"_id": key},
+        {"$set": {
+            "model": LLM_MODEL,
+            "response": response,
+            "expires_at": datetime.utcnow() + timedelta(seconds=LLM_CACHE_TTL_SECONDS),
+        }},
+        upsert=True,
+    )
+
+
+async def ask_llm(prompt: str, use_cache: bool = True) -> str:
+    if use_cache:
+        key = llm_cache_key(prompt)
+        cached = await get_cached_response(key)
+        if cached is not None:
+            return cached
+
+    if _llm is None:
+        raise ValueError("OPENROUTER_API_KEY not set")
+
+    async with _llm_slots:
+        with track_upstream("llm"):
+            response = await _llm.ainvoke(prompt)
+
+    if use_cache:
+        await store_response(key, response.content)
+    return response.content
+
+
+async def stream_llm(prompt: str, use_cache: bool = True):
+    """Yield completion text chunks as the upstream produces them"""
+    if use_cache:
+        key = llm_cache_key(prompt)
+        cached = await get_cached_response(key)
+        if cached is not None:
+            yield cached
+            return
+
+    if _llm is None:
+        raise ValueError("OPENROUTER_API_KEY not set")
+
+    chunks = []
+    async with _llm_slots:
+        with track_upstream("llm_stream"):
+            async for chunk in _llm.astream(prompt):
+                if chunk.content:
+                    chunks.append(chunk.content)
+                    yield chunk.content
+
+    if use_cache:
+        await store_response(key, "".join(chunks))
+
+
+async def fetch_search_results(query: str) -> List[Dict[str, str]]:
+    """
+    Search the web using Serper API
+    https://serper.dev/
+    """
+    
+    SERPER_API_KEY = os.getenv('SERPER_API_KEY')
+    if not SERPER_API_KEY:
+        raise ValueError("SERPER_API_KEY not set")
+
+    headers = {
+        "X-API-KEY": SERPER_API_KEY,
+        "Content-Type": "application/json"
+    }
+    payload = {
+        "q": query,
+        "num": 5
+    }
+
+    try:
+        async with _search_slots:
+            with track_upstream("search"):
+                response = await _http.post(
+                    SERPER_URL,
+                    json=payload,
+                    headers=headers,
+                    timeout=SEARCH_TIMEOUT_SECONDS
+                )
+                response.raise_for_status()
+        data = response.json()
+
+        results = []
+        for item in data.get("organic", []):
+            results.append({
+                "title": item.get("title", ""),
+                "snippet": item.get("snippet", ""),
+                "url": item.get("link", "")
+            })
+
+        return results
+
+    except httpx.HTTPError as e:
+        raise RuntimeError(f"Serper request failed: {e}")
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+async def _search_and_cache(key: str, query: str) -> List[Dict[str, str]]:
+    try:
+        results = await fetch_search_results(query)
+        search_cache.set(key, results)
+        return results
+    finally:
+        _search_inflight.pop(key, None)
+
+
+async def search_web(query: str) -> List[Dict[str, str]]:
+    """
+    Cached web search. Identical queries within the TTL are served from memory and
+    concurrent identical queries share a single upstream call.
+    """
+    global search_coalesced
+    key = normalize_query(query)
+
+    results = search_cache.get(key)
+    if results is not None:
+        return results
+
+    task = _search_inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(_search_and_cache(key, query))
+        _search_inflight[key] = task
+    else:
+        search_coalesced += 1
+
+    # shield so one cancelled caller does not cancel the call the others are waiting on
+    return await asyncio.shield(task)
+
+
+def stats() -> dict:
+    return {
+        "search_cache": {**search_cache.stats(), "coalesced": search_coalesced},
+        "llm_cache": {**llm_cache.stats(), "db_hits": llm_cache_db_hits},
+    }
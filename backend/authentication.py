@@ -2,7 +2,7 @@ from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm, OAuth2PasswordBearer
 
 import database
-from hashing import Hash
+from hashing import Hash, HashQueueFull
 import jwt_token
 import database
 
@@ -22,7 +22,16 @@ async def login_user(
             detail="User Not Found",
         )
 
-    if not Hash.verify(request.password, user["password"]):
+    try:
+        password_ok = await Hash.verify_async(request.password, user["password"])
+    except HashQueueFull:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server busy, please retry",
+            headers={"Retry-After": "1"},
+        )
+
+    if not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid credentials",
@@ -0,0 +1,66 @@
+"""
+Compare two load-test result files and flag per-route regressions.
+Exits non-zero when any route's p95 got worse by more than the threshold. From backend/:
+
+    python -m benchmarks.compare before.json after.json --threshold 10
+"""
+import argparse
+import json
+
+
+def change(before: float, after: float) -> float:
+    if before == 0:
+        return 0.0
+    return (after - before) / before * 100
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> list:
+    """Print a per-route diff and return the routes whose p95 regressed past threshold"""
+    print(f"baseline {baseline.get('commit')} ({baseline['total_rps']} req/s) -> "
+          f"current {current.get('commit')} ({current['total_rps']} req/s)")
+    if baseline.get("scale") != current.get("scale") or baseline.get("concurrency") != current.get("concurrency"):
+        print("warning: runs used different scale or concurrency settings")
+
+    header = f"{'route':<36}{'rps':>16}{'p50 ms':>18}{'p95 ms':>18}{'p99 ms':>18}"
+    print(header)
+    print("-" * len(header))
+
+    regressions = []
+    for route in sorted(set(baseline["routes"]) | set(current["routes"])):
+        old, new = baseline["routes"].get(route), current["routes"].get(route)
+        if old is None or new is None:
+            print(f"{route:<36}{'only in ' + ('current' if old is None else 'baseline'):>16}")
+            continue
+
+        cells = []
+        for key in ["rps", "p50_ms", "p95_ms", "p99_ms"]:
+            cells.append(f"{new[key]:>9.1f} {change(old[key], new[key]):>+6.1f}%")
+        flag = ""
+        if change(old["p95_ms"], new["p95_ms"]) > threshold:
+            regressions.append(route)
+            flag = "  REGRESSION"
+        print(f"{route:<36}{cells[0]:>16}{cells[1]:>18}{cells[2]:>18}{cells[3]:>18}{flag}")
+
+    if regressions:
+        print(f"\n{len(regressions)} route(s) regressed more than {threshold}% at p95")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two load-test result files")
+    parser.add_argument("baseline")
+    parser.add_argument("current")
+    parser.add_argument("--threshold", type=float, default=10, help="allowed p95 regression in percent")
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    if compare(baseline, current, args.threshold):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
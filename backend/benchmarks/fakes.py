@@ -0,0 +1,46 @@
+"""
+Stand-ins for the LLM and Serper so benchmarks measure this app, not the upstreams.
+Each fake sleeps for a fixed latency to keep connection and slot behaviour realistic.
+"""
+import asyncio
+
+import assistant
+
+
+class FakeMessage:
+    def __init__(self, content: str):
+        self.content = content
+
+
+class FakeLLM:
+    def __init__(self, latency: float, chunks: int = 20):
+        self.latency = latency
+        self.chunks = chunks
+
+    async def ainvoke(self, prompt: str):
+        await asyncio.sleep(self.latency)
+        return FakeMessage(" ".join(["token"] * self.chunks))
+
+    async def astream(self, prompt: str):
+        for _ in range(self.chunks):
+            await asyncio.sleep(self.latency / self.chunks)
+            yield FakeMessage("token ")
+
+
+def install(llm_latency: float = 0.2, search_latency: float = 0.1):
+    """Patch assistant so its startup wires in the fakes instead of OpenRouter and Serper"""
+    real_startup = assistant.startup
+
+    async def startup():
+        await real_startup()
+        assistant._llm = FakeLLM(llm_latency)
+
+    async def fetch_search_results(query: str):
+        await asyncio.sleep(search_latency)
+        return [
+            {"title": f"Result {i} for {query}", "snippet": f"Snippet {i} about {query}", "url": f"https://example.com/{i}"}
+            for i in range(5)
+        ]
+
+    assistant.startup = startup
+    assistant.fetch_search_results = fetch_search_results
@@ -0,0 +1,283 @@
+"""
+Load generator: seeds the benchmark database, drives a weighted mix of API calls
+from concurrent virtual users and reports throughput and p50/p95/p99 per route.
+
+By default the app runs in-process behind httpx's ASGI transport with the LLM and
+search faked; --base-url targets a server started with benchmarks.serve instead.
+Needs a mongod at MONGO_URL. From backend/:
+
+    python -m benchmarks.load --duration 30 --concurrency 32 --output after.json
+    python -m benchmarks.load --duration 30 --compare before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import time
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+
+os.environ.setdefault("DB_NAME", "notesapp_bench")
+os.environ.setdefault("LOG_SAMPLE_RATE", "0")
+
+import httpx
+
+from benchmarks import compare, fakes, seed
+
+def _projects(rng, user, words):
+    return "GET", "/projects", {"params": {"summary": "true"}}
+
+
+def _project(rng, user, words):
+    if not user["projects"]:
+        return None
+    return "GET", f"/projects/{rng.choice(user['projects'])['id']}", {}
+
+
+def _note(rng, user, words):
+    projects = [p for p in user["projects"] if p["notes"]]
+    if not projects:
+        return None
+    project = rng.choice(projects)
+    return "GET", f"/projects/{project['id']}/notes/{rng.choice(project['notes'])}", {}
+
+
+def _conversation(rng, user, words):
+    if not user["partners"]:
+        return None
+    return "GET", f"/messages/{rng.choice(user['partners'])}", {}
+
+
+def _send_message(rng, user, words):
+    if not user["partners"]:
+        return None
+    return "POST", "/messages", {"json": {"receiver_id": rng.choice(user["partners"]), "content": "bench message"}}
+
+
+def _thread(rng, user, words):
+    if not user["tasks"]:
+        return None
+    return "GET", f"/tasks/{rng.choice(user['tasks'])}/thread", {}
+
+
+def _task_message(rng, user, words):
+    if not user["tasks"]:
+        return None
+    return "POST", f"/tasks/{rng.choice(user['tasks'])}/messages", {"json": {"text": "bench reply"}}
+
+
+def _tasks(rng, user, words):
+    return "GET", "/tasks", {}
+
+
+def _conversations(rng, user, words):
+    return "GET", "/messages/conversations", {}
+
+
+def _mentions(rng, user, words):
+    return "GET", "/mentions", {}
+
+
+def _user_search(rng, user, words):
+    return "GET", "/users/search", {"params": {"q": rng.choice(words)[:rng.randint(1, 3)]}}
+
+
+def _search(rng, user, words):
+    return "GET", "/search", {"params": {"q": " ".join(rng.sample(words, 2))}}
+
+
+def _llm(rng, user, words):
+    question = " ".join(rng.sample(words, 4))
+    return "POST", "/llms", {"json": {
+        "messages": [{"role": "user", "message": question}],
+        "use_search": rng.random() < 0.5,
+        "use_cache": rng.random() < 0.5,
+    }}
+
+
+def _login(rng, user, words):
+    return "POST", "/login", {"data": {"username": user["email"], "password": seed.PASSWORD}}
+
+
+# (route label, weight, builder); a builder returns (method, url, httpx kwargs),
+# or None when the picked user has nothing to hit on that route
+MIX = [
+    ("GET /projects", 10, _projects),
+    ("GET /projects/{id}", 10, _project),
+    ("GET /projects/{id}/notes/{note_id}", 8, _note),
+    ("GET /tasks", 10, _tasks),
+    ("GET /tasks/{id}/thread", 8, _thread),
+    ("GET /messages/conversations", 8, _conversations),
+    ("GET /messages/{other}", 10, _conversation),
+    ("GET /mentions", 5, _mentions),
+    ("GET /search", 6, _search),
+    ("GET /users/search", 6, _user_search),
+    ("POST /messages", 5, _send_message),
+    ("POST /tasks/{id}/messages", 4, _task_message),
+    ("POST /llms", 2, _llm),
+    ("POST /login", 1, _login),
+]
+
+
+def percentile(sorted_values, q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(q * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(samples: dict, errors: dict, elapsed: float) -> dict:
+    routes = {}
+    for route in sorted(set(samples) | set(errors)):
+        latencies = sorted(samples.get(route, []))
+        routes[route] = {
+            "requests": len(latencies),
+            "errors": errors.get(route, 0),
+            "rps": round(len(latencies) / elapsed, 2),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "mean_ms": round(sum(latencies) / len(latencies) * 1000, 2) if latencies else 0.0,
+        }
+    return routes
+
+
+def print_report(result: dict):
+    header = f"{'route':<36}{'reqs':>8}{'errs':>6}{'rps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for route, row in result["routes"].items():
+        print(f"{route:<36}{row['requests']:>8}{row['errors']:>6}{row['rps']:>9.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}")
+    print(f"\n{result['total_requests']} requests in {result['elapsed_s']}s = {result['total_rps']} req/s")
+
+
+@asynccontextmanager
+async def open_client(base_url: str | None, concurrency: int, llm_latency: float, search_latency: float):
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    if base_url:
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+            yield client
+        return
+
+    fakes.install(llm_latency, search_latency)
+    import main
+
+    # runs the app's own startup and shutdown (indexes, upstream clients, realtime)
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            yield client
+
+
+async def run(args) -> dict:
+    scale = seed.scale_from_args(args)
+    if args.skip_seed:
+        data = seed.fixture(seed.generate(scale))
+    else:
+        data = await seed.seed(scale)
+
+    users = data["users"]
+    words = data["words"]
+    mix = [entry for entry in MIX if not args.routes or any(r in entry[0] for r in args.routes)]
+    routes = [entry[0] for entry in mix]
+    weights = [entry[1] for entry in mix]
+    builders = {entry[0]: entry[2] for entry in mix}
+
+    samples, errors = {}, {}
+
+    async def virtual_user(client, worker: int, deadline: float, record: bool):
+        rng = random.Random(f"{scale.seed}-{worker}")
+        while time.perf_counter() < deadline:
+            user = rng.choice(users)
+            route = rng.choices(routes, weights)[0]
+            built = builders[route](rng, user, words)
+            if built is None:
+                continue
+            method, url, kwargs = built
+            headers = {"Authorization": f"Bearer {user['token']}"}
+
+            start = time.perf_counter()
+            try:
+                response = await client.request(method, url, headers=headers, **kwargs)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            elapsed = time.perf_counter() - start
+
+            if not record:
+                continue
+            if failed:
+                errors[route] = errors.get(route, 0) + 1
+            else:
+                samples.setdefault(route, []).append(elapsed)
+
+    async with open_client(args.base_url, args.concurrency, args.llm_latency, args.search_latency) as client:
+        if args.warmup > 0:
+            deadline = time.perf_counter() + args.warmup
+            await asyncio.gather(*(virtual_user(client, -i - 1, deadline, False) for i in range(args.concurrency)))
+
+        started = time.perf_counter()
+        deadline = started + args.duration
+        await asyncio.gather(*(virtual_user(client, i, deadline, True) for i in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    total = sum(len(v) for v in samples.values())
+    return {
+        "commit": git_commit(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "target": args.base_url or "in-process",
+        "scale": asdict(scale),
+        "concurrency": args.concurrency,
+        "duration_s": args.duration,
+        "elapsed_s": round(elapsed, 2),
+        "total_requests": total,
+        "total_rps": round(total / elapsed, 2),
+        "routes": summarize(samples, errors, elapsed),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the API with a seeded dataset")
+    seed.add_scale_args(parser)
+    parser.add_argument("--duration", type=float, default=20, help="measured seconds")
+    parser.add_argument("--warmup", type=float, default=3, help="unmeasured seconds before the run")
+    parser.add_argument("--concurrency", type=int, default=16, help="virtual users")
+    parser.add_argument("--routes", nargs="*", help="only routes whose label contains one of these")
+    parser.add_argument("--base-url", help="target a running server instead of the in-process app")
+    parser.add_argument("--skip-seed", action="store_true", help="reuse data seeded with the same scale")
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--search-latency", type=float, default=0.1)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--compare", help="baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=10, help="allowed p95 regression in percent")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(result, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print()
+        if compare.compare(baseline, result, args.threshold):
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+"""
+Seeded data generator for benchmarks. The same seed and scale always produce
+the same documents, so two runs against the same commit see the same data.
+
+Writes into DB_NAME (default notesapp_bench), dropping the app's collections first.
+From backend/:
+
+    python -m benchmarks.seed --users 200 --projects-per-user 3 --notes-per-project 50
+"""
+import argparse
+import asyncio
+import os
+import random
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta
+
+os.environ.setdefault("DB_NAME", "notesapp_bench")
+os.environ.setdefault("LOG_SAMPLE_RATE", "0")
+
+from bson import ObjectId
+
+import database, indexes, jwt_token, search
+from hashing import Hash
+
+PASSWORD = "bench-password"
+COLLECTIONS = ["users", "projects", "notes", "messages", "conversations",
+               "tasks", "task_messages", "mentions", "llm_cache"]
+WORDS = (
+    "alpha budget cache deploy design draft index launch meeting metric migration "
+    "notes outage plan query release review roadmap schema search sprint task "
+    "timeline update worker"
+).split()
+INSERT_BATCH = 1000
+
+
+@dataclass
+class Scale:
+    users: int = 50
+    projects_per_user: int = 2
+    members_per_project: int = 5
+    notes_per_project: int = 30
+    conversations_per_user: int = 3
+    messages_per_conversation: int = 40
+    tasks_per_user: int = 5
+    thread_roots: int = 5
+    reply_depth: int = 3
+    seed: int = 42
+
+
+def add_scale_args(parser: argparse.ArgumentParser):
+    for name, default in asdict(Scale()).items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=default)
+
+
+def scale_from_args(args) -> Scale:
+    return Scale(**{name: getattr(args, name) for name in asdict(Scale())})
+
+
+class Generator:
+    def __init__(self, scale: Scale):
+        self.scale = scale
+        self.rng = random.Random(scale.seed)
+        self.clock = datetime(2025, 1, 1)
+
+    def text(self, words: int) -> str:
+        return " ".join(self.rng.choice(WORDS) for _ in range(words))
+
+    def tick(self) -> datetime:
+        self.clock += timedelta(seconds=self.rng.randint(1, 90))
+        return self.clock
+
+    def object_id(self) -> ObjectId:
+        # ObjectIds from the rng rather than the clock, so reruns get identical ids
+        return ObjectId(self.rng.randbytes(12))
+
+    def users(self, password_hash: str):
+        users = []
+        for i in range(self.scale.users):
+            # the name word comes from the index, not the rng, so the seeded stream
+            # (and every id and document after it) matches older runs
+            name, username, email = f"{WORDS[i % len(WORDS)].title()} User {i}", f"user{i}", f"user{i}@bench.local"
+            users.append({
+                "_id": self.object_id(),
+                "name": name,
+                "email": email,
+                "username": username,
+                "password": password_hash,
+                "search_keys": search.user_search_keys(name, username, email),
+            })
+        return users
+
+    def projects(self, users):
+        projects, notes = [], []
+        for owner in users:
+            for _ in range(self.scale.projects_per_user):
+                others = self.rng.sample(users, min(len(users), self.scale.members_per_project))
+                members = [owner] + [u for u in others if u is not owner][:self.scale.members_per_project - 1]
+                project = {
+                    "_id": self.object_id(),
+                    "title": self.text(3).title(),
+                    "description": self.text(12),
+                    "createdBy": str(owner["_id"]),
+                    "createdAt": self.tick().replace(microsecond=0),
+                    "version": 1,
+                    "members": [{"id": str(u["_id"]), "name": u["name"], "email": u["email"]} for u in members],
+                }
+                projects.append(project)
+                for _ in range(self.scale.notes_per_project):
+                    notes.append({
+                        "_id": self.object_id(),
+                        "project_id": project["_id"],
+                        "title": self.text(4).title(),
+                        "body": self.text(self.rng.randint(20, 200)),
+                        "createdAt": self.tick().replace(microsecond=0),
+                    })
+        return projects, notes
+
+    def messages(self, users):
+        messages, conversations = [], {}
+        for user in users:
+            partners = self.rng.sample(users, min(len(users), self.scale.conversations_per_user + 1))
+            for partner in [p for p in partners if p is not user][:self.scale.conversations_per_user]:
+                pair = (str(user["_id"]), str(partner["_id"]))
+                key = ":".join(sorted(pair))
+                if key in conversations:
+                    continue
+                conversations[key] = pair
+                for _ in range(self.scale.messages_per_conversation):
+                    sender, receiver = pair if self.rng.random() < 0.5 else pair[::-1]
+                    messages.append({
+                        "_id": self.object_id(),
+                        "sender_id": sender,
+                        "receiver_id": receiver,
+                        "content": self.text(self.rng.randint(3, 30)),
+                        "created_at": self.tick(),
+                        "read": self.rng.random() < 0.8,
+                    })
+        return messages, list(conversations.values())
+
+    def thread(self, task, users, depth: int, parent=None):
+        """Top-level messages (or replies to parent) down to reply_depth, two replies per level"""
+        rows = []
+        count = self.scale.thread_roots if parent is None else 2
+        for _ in range(count):
+            _id = self.object_id()
+            mentioned = self.rng.choice(users)["username"] if self.rng.random() < 0.3 else None
+            text = self.text(self.rng.randint(5, 40)) + (f" @{mentioned}" if mentioned else "")
+            sender = self.rng.choice(users)
+            row = {
+                "_id": _id,
+                "task_id": task["_id"],
+                "id": str(_id),
+                "text": text,
+                "sender": sender["name"],
+                "sender_username": sender["username"],
+                "timestamp": self.tick(),
+                "parentId": parent["id"] if parent else None,
+                "path": f"{parent['path']}/{_id}" if parent else str(_id),
+                "depth": depth,
+                "reply_count": 0,
+            }
+            rows.append(row)
+            if depth + 1 < self.scale.reply_depth:
+                replies = self.thread(task, users, depth + 1, row)
+                row["reply_count"] = sum(1 for r in replies if r["parentId"] == row["id"])
+                rows.extend(replies)
+        return rows
+
+    def tasks(self, users):
+        tasks, task_messages, mentions = [], [], []
+        for owner in users:
+            for _ in range(self.scale.tasks_per_user):
+                task = {
+                    "_id": self.object_id(),
+                    "title": self.text(4).capitalize(),
+                    "status": self.rng.choice(["pending", "completed"]),
+                    "owner": owner["username"],
+                    "created_at": self.tick(),
+                    "version": 1,
+                }
+                thread = self.thread(task, users, 0) if self.scale.reply_depth > 0 else []
+                mentioned = set()
+                for row in thread:
+                    for word in row["text"].split():
+                        if word.startswith("@"):
+                            mentioned.add(word[1:])
+                            mentions.append({
+                                "user": word[1:],
+                                "task_id": task["_id"],
+                                "message_id": row["id"],
+                                "excerpt": row["text"][:140],
+                                "sender": row["sender"],
+                                "created_at": row["timestamp"],
+                                "read": False,
+                            })
+                task["message_count"] = len(thread)
+                task["mentioned_users"] = sorted(mentioned)
+                tasks.append(task)
+                task_messages.extend(thread)
+        return tasks, task_messages, mentions
+
+
+async def insert(collection, docs):
+    for start in range(0, len(docs), INSERT_BATCH):
+        await collection.insert_many(docs[start:start + INSERT_BATCH], ordered=False)
+
+
+def generate(scale: Scale, password_hash: str = "") -> dict:
+    gen = Generator(scale)
+    users = gen.users(password_hash)
+    projects, notes = gen.projects(users)
+    messages, conversations = gen.messages(users)
+    tasks, task_messages, mentions = gen.tasks(users)
+    return {
+        "users": users, "projects": projects, "notes": notes, "messages": messages,
+        "conversations": conversations, "tasks": tasks, "task_messages": task_messages,
+        "mentions": mentions,
+    }
+
+
+async def seed(scale: Scale, db=None) -> dict:
+    """Reset the benchmark database and fill it. Returns the fixture the load generator needs."""
+    db = db if db is not None else database.get_db()
+    if db.name == "projectdb":
+        raise SystemExit("Refusing to seed the application database; set DB_NAME to a scratch database")
+
+    for name in COLLECTIONS:
+        await db.drop_collection(name)
+    await indexes.ensure_indexes(db)
+
+    # one hash for everyone: seeding shouldn't spend minutes in bcrypt
+    docs = generate(scale, Hash.bcrypt(PASSWORD))
+    for name in ["users", "projects", "notes", "messages", "tasks", "task_messages", "mentions"]:
+        await insert(db[name], docs[name])
+
+    return fixture(docs)
+
+
+def fixture(docs: dict) -> dict:
+    """
+    Per-user ids to build requests from, plus a long-lived token for each user.
+    Generation is deterministic, so fixture(generate(scale)) matches an earlier seed.
+    """
+    by_id = {}
+    for user in docs["users"]:
+        by_id[str(user["_id"])] = {
+            "id": str(user["_id"]),
+            "email": user["email"],
+            "username": user["username"],
+            "token": jwt_token.create_access_token({"sub": user["email"]}, timedelta(hours=12)),
+            "projects": [],
+            "partners": [],
+            "tasks": [],
+        }
+
+    notes_by_project = {}
+    for note in docs["notes"]:
+        notes_by_project.setdefault(note["project_id"], []).append(str(note["_id"]))
+    for project in docs["projects"]:
+        entry = {"id": str(project["_id"]), "notes": notes_by_project.get(project["_id"], [])}
+        for member in project["members"]:
+            by_id[member["id"]]["projects"].append(entry)
+
+    for a, b in docs["conversations"]:
+        by_id[a]["partners"].append(b)
+        by_id[b]["partners"].append(a)
+
+    by_username = {u["username"]: u for u in by_id.values()}
+    for task in docs["tasks"]:
+        for username in {task["owner"], *task["mentioned_users"]}:
+            if username in by_username:
+                by_username[username]["tasks"].append(str(task["_id"]))
+
+    return {"users": list(by_id.values()), "words": WORDS}
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Seed the benchmark database")
+    add_scale_args(parser)
+    scale = scale_from_args(parser.parse_args())
+    data = await seed(scale)
+    print(f"Seeded {database.DB_NAME}: {len(data['users'])} users, {asdict(scale)}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
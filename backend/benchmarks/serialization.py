@@ -0,0 +1,143 @@
+"""
+Compare the default FastAPI serialization path with the orjson response layer
+for the payloads of the heaviest routes: CPU per response and bytes on the wire.
+
+Runs offline on synthetic payloads shaped by schemas.py. From backend/:
+
+    python -m benchmarks.serialization [--scale 1.0] [--repeat 200]
+"""
+import argparse
+import gzip
+import json
+import random
+import string
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+import brotli
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+
+import models, schemas
+from responses import COMPRESSION_QUALITY, dumps
+
+random.seed(7)
+
+
+def text(words: int) -> str:
+    return " ".join(
+        "".join(random.choices(string.ascii_lowercase, k=random.randint(2, 9)))
+        for _ in range(words)
+    )
+
+
+def when(i: int) -> datetime:
+    return datetime(2025, 1, 1) + timedelta(minutes=i)
+
+
+def project_payload(notes: int, members: int) -> dict:
+    return {
+        "id": str(ObjectId()),
+        "title": text(4),
+        "description": text(30),
+        "createdBy": str(ObjectId()),
+        "createdAt": when(0),
+        "version": 12,
+        "members": [
+            {"id": str(ObjectId()), "name": text(2), "email": f"user{i}@example.com"}
+            for i in range(members)
+        ],
+        "notes": [
+            {"id": str(ObjectId()), "title": text(5), "preview": text(20)[:100],
+             "truncated": True, "createdAt": when(i)}
+            for i in range(notes)
+        ],
+    }
+
+
+def tasks_payload(tasks: int) -> list:
+    return [
+        schemas.get_task({
+            "_id": ObjectId(),
+            "title": text(6),
+            "status": random.choice(["pending", "completed"]),
+            "created_at": when(i),
+            "mentioned_users": [text(1) for _ in range(3)],
+            "message_count": random.randint(0, 40),
+        })
+        for i in range(tasks)
+    ]
+
+
+def messages_payload(messages: int) -> dict:
+    return {
+        "messages": [
+            {"_id": str(ObjectId()), "sender_id": str(ObjectId()), "receiver_id": str(ObjectId()),
+             "content": text(25), "created_at": when(i), "read": True, "sender_name": text(2)}
+            for i in range(messages)
+        ],
+        "next_cursor": "Y3Vyc29y",
+    }
+
+
+def thread_payload(messages: int) -> dict:
+    return {
+        "messages": [
+            schemas.get_task_message({
+                "id": str(ObjectId()), "text": text(30), "sender": text(2),
+                "timestamp": when(i), "parentId": None, "depth": i % 4, "reply_count": 2,
+            })
+            for i in range(messages)
+        ],
+        "next_cursor": None,
+    }
+
+
+def default_path(content, adapter: TypeAdapter | None):
+    """What FastAPI does for a returned dict: optional response_model pass, jsonable_encoder, json.dumps"""
+    if adapter is not None:
+        content = adapter.dump_python(adapter.validate_python(content), mode="json")
+    content = jsonable_encoder(content)
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                      separators=(",", ":")).encode("utf-8")
+
+
+def cpu_per_call(fn, repeat: int) -> float:
+    start = time.process_time()
+    for _ in range(repeat):
+        fn()
+    return (time.process_time() - start) / repeat * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplies payload sizes")
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+    n = lambda base: max(1, int(base * args.scale))
+
+    routes = [
+        ("GET /projects/{id}", project_payload(n(500), n(20)), None),
+        ("GET /tasks", tasks_payload(n(300)), TypeAdapter(List[models.Task])),
+        ("GET /messages/{user}", messages_payload(n(50)), None),
+        ("GET /tasks/{id}/thread", thread_payload(n(100)), None),
+    ]
+
+    header = f"{'route':<24}{'default us':>12}{'orjson us':>12}{'speedup':>9}{'raw B':>10}{'gzip B':>10}{'br B':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, content, adapter in routes:
+        before = cpu_per_call(lambda: default_path(content, adapter), args.repeat)
+        after = cpu_per_call(lambda: dumps(content), args.repeat)
+        body = dumps(content)
+        print(
+            f"{name:<24}{before:>12.0f}{after:>12.0f}{before / after:>8.1f}x"
+            f"{len(body):>10}{len(gzip.compress(body, 9)):>10}"
+            f"{len(brotli.compress(body, quality=COMPRESSION_QUALITY)):>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Run the API on a real socket with the upstream fakes installed, for load runs
+that keep the load generator out of the server process. From backend/:
+
+    python -m benchmarks.serve --port 8001
+    python -m benchmarks.load --base-url http://127.0.0.1:8001 --skip-seed
+"""
+import argparse
+import os
+
+os.environ.setdefault("DB_NAME", "notesapp_bench")
+os.environ.setdefault("LOG_SAMPLE_RATE", "0")
+
+import uvicorn
+
+from benchmarks import fakes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the app with faked LLM and search")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--llm-latency", type=float, default=0.2)
+    parser.add_argument("--search-latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    fakes.install(args.llm_latency, args.search_latency)
+    import main as app_module
+
+    uvicorn.run(app_module.app, host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,106 @@
-from motor.motor_asyncio import AsyncIOMotorClient
+"""
+Mongo client lifecycle. The app opens the client in its lifespan via connect()
+and closes it on shutdown; scripts can just call get_db(), which connects lazily.
+
+Pool and driver settings come from the environment so pools can be sized
+against the number of uvicorn workers (each worker has its own pool).
+"""
+import asyncio
 import os
+
 from dotenv import load_dotenv
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import SecondaryPreferred
+
+import metrics
 
 load_dotenv()
 
 MONGO_URL = os.getenv('MONGO_URL')
-DB_NAME = "projectdb"
+DB_NAME = os.getenv("DB_NAME", "projectdb")
 
-client = AsyncIOMotorClient(MONGO_URL)
-db = client[DB_NAME]
+MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MAX_IDLE_TIME_MS = int(os.getenv("MONGO_MAX_IDLE_TIME_MS", "300000"))
+SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+CONNECT_TIMEOUT_MS = int(os.getenv("MONGO_CONNECT_TIMEOUT_MS", "5000"))
+# e.g. "zstd,snappy,zlib"; zstd and snappy need their python packages installed
+COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+WRITE_CONCERN = os.getenv("MONGO_WRITE_CONCERN", "")  # "majority" or a node count
+WRITE_TIMEOUT_MS = int(os.getenv("MONGO_WRITE_TIMEOUT_MS", "0"))
+# connections opened at startup so first requests don't pay for the handshake
+WARMUP_CONNECTIONS = int(os.getenv("MONGO_WARMUP_CONNECTIONS", str(max(1, MIN_POOL_SIZE))))
+# list endpoints may read from secondaries when this is set; -1 means no staleness bound
+SECONDARY_LIST_READS = os.getenv("MONGO_SECONDARY_LIST_READS") == "1"
+MAX_STALENESS_SECONDS = int(os.getenv("MONGO_MAX_STALENESS_SECONDS", "-1"))
 
-def get_db():
+client: AsyncIOMotorClient | None = None
+db = None
+list_db = None
+
+
+def client_options() -> dict:
+    options = {
+        "maxPoolSize": MAX_POOL_SIZE,
+        "minPoolSize": MIN_POOL_SIZE,
+        "maxIdleTimeMS": MAX_IDLE_TIME_MS,
+        "serverSelectionTimeoutMS": SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": CONNECT_TIMEOUT_MS,
+        # command monitoring feeds the per-collection timings on /metrics
+        "event_listeners": [metrics.MongoCommandListener()],
+    }
+    if COMPRESSORS:
+        options["compressors"] = COMPRESSORS
+    if WRITE_CONCERN:
+        options["w"] = int(WRITE_CONCERN) if WRITE_CONCERN.isdigit() else WRITE_CONCERN
+    if WRITE_TIMEOUT_MS:
+        options["wTimeoutMS"] = WRITE_TIMEOUT_MS
+    return options
+
+
+def connect():
+    """Create the client if needed. Motor does no I/O here; see warmup()."""
+    global client, db, list_db
+    if client is None:
+        client = AsyncIOMotorClient(MONGO_URL, **client_options())
+        db = client[DB_NAME]
+        if SECONDARY_LIST_READS:
+            list_db = client.get_database(
+                DB_NAME, read_preference=SecondaryPreferred(max_staleness=MAX_STALENESS_SECONDS)
+            )
+        else:
+            list_db = db
     return db
+
+
+async def warmup():
+    """Ping over WARMUP_CONNECTIONS connections at once so the pool starts with them open"""
+    connect()
+    await asyncio.gather(*(client.admin.command("ping") for _ in range(WARMUP_CONNECTIONS)))
+
+
+async def ping(timeout: float = 2) -> bool:
+    if client is None:
+        return False
+    try:
+        await asyncio.wait_for(client.admin.command("ping"), timeout)
+        return True
+    except Exception:
+        return False
+
+
+def close():
+    global client, db, list_db
+    if client is not None:
+        client.close()
+    client = db = list_db = None
+
+
+def get_db():
+    return db if db is not None else connect()
+
+
+def get_list_db():
+    """Database handle for list endpoints that tolerate slightly stale reads"""
+    get_db()
+    return list_db
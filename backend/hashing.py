@@ -1,10 +1,40 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt releases the GIL, so a small thread pool keeps it off the event loop
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", "4"))
+# hashes allowed to wait for a worker before new requests are turned away
+HASH_QUEUE_LIMIT = int(os.getenv("HASH_QUEUE_LIMIT", "64"))
+
+_executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
+_slots = asyncio.Semaphore(HASH_WORKERS + HASH_QUEUE_LIMIT)
+
+
+class HashQueueFull(Exception):
+    pass
+
+
 class Hash():
     def bcrypt(password: str):
         return pwd_context.hash(password)
     
     def verify(plain_password, hashed_password):
-        return pwd_context.verify(plain_password, hashed_password)
\ No newline at end of file
+        return pwd_context.verify(plain_password, hashed_password)
+
+    async def _run(func, *args):
+        # admission control: a login storm queues up to the limit instead of piling onto the loop
+        if _slots.locked():
+            raise HashQueueFull()
+        async with _slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(_executor, func, *args)
+
+    async def bcrypt_async(password: str):
+        return await Hash._run(Hash.bcrypt, password)
+
+    async def verify_async(plain_password, hashed_password):
+        return await Hash._run(Hash.verify, plain_password, hashed_password)
@@ -0,0 +1,157 @@
+"""
+Index manifest for the collections queried in main.py.
+
+ensure_indexes() is applied on startup and is idempotent: create_index is a
+no-op when an index with the same keys and options already exists.
+verify_query_plans() explains each hot query and fails if any of them falls
+back to a collection scan, or sorts in memory when it asks for an order. Run this file directly to do both against MONGO_URL.
+"""
+import asyncio
+from bson import ObjectId
+from pymongo import ASCENDING, DESCENDING, TEXT
+
+import database
+
+
+INDEXES = {
+    "users": [
+        ([("email", ASCENDING)], {"unique": True}),
+        ([("username", ASCENDING)], {"unique": True}),
+        # directory prefix search, paged by username
+        ([("search_keys", ASCENDING), ("username", ASCENDING)], {"name": "users_search"}),
+    ],
+    "messages": [
+        # conversation history and unread updates
+        ([("sender_id", ASCENDING), ("receiver_id", ASCENDING),
+          ("created_at", DESCENDING), ("_id", DESCENDING)], {}),
+        # sender side of the /messages and inbox $or, already in page order
+        ([("sender_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {}),
+        # receiver side of the inbox
+        ([("receiver_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {}),
+    ],
+    "projects": [
+        ([("members.id", ASCENDING)], {}),
+        ([("createdBy", ASCENDING)], {}),
+    ],
+    "notes": [
+        ([("project_id", ASCENDING), ("createdAt", DESCENDING)], {}),
+        ([("title", TEXT), ("body", TEXT)], {"weights": {"title": 5, "body": 1}, "name": "notes_text"}),
+    ],
+    "tasks": [
+        ([("owner", ASCENDING), ("created_at", DESCENDING)], {}),
+        ([("mentioned_users", ASCENDING), ("created_at", DESCENDING)], {}),
+        ([("title", TEXT)], {"name": "tasks_title_text"}),
+    ],
+    "task_messages": [
+        ([("task_id", ASCENDING), ("id", ASCENDING)], {"unique": True}),
+        # depth-first thread order and subtree lookups by path prefix
+        ([("task_id", ASCENDING), ("path", ASCENDING)], {}),
+        ([("text", TEXT)], {"name": "task_messages_text"}),
+    ],
+    "mentions": [
+        ([("user", ASCENDING), ("task_id", ASCENDING), ("message_id", ASCENDING)], {"unique": True}),
+        ([("user", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {}),
+        ([("user", ASCENDING), ("read", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], {}),
+        ([("task_id", ASCENDING), ("message_id", ASCENDING)], {}),
+    ],
+    "llm_cache": [
+        # per-entry expiry: documents are removed once expires_at passes
+        ([("expires_at", ASCENDING)], {"expireAfterSeconds": 0}),
+    ],
+}
+
+# indexes replaced by the manifest above; a collection allows only one text index
+OBSOLETE_INDEXES = {
+    "tasks": ["tasks_text"],
+}
+
+
+_SAMPLE_ID = "000000000000000000000000"
+_SAMPLE_USERNAME = "sample"
+
+# (collection, filter, sort) for every query on a hot route
+HOT_QUERIES = [
+    ("users", {"email": "sample@example.com"}, None),
+    # ordered by username with a bounded in-memory sort over the prefix matches, by design
+    ("users", {"search_keys": {"$regex": "^sam"}}, None),
+    ("messages", {"$or": [
+        {"sender_id": _SAMPLE_ID},
+        {"receiver_id": _SAMPLE_ID},
+    ]}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("messages", {"$or": [
+        {"sender_id": _SAMPLE_ID, "receiver_id": _SAMPLE_ID},
+        {"sender_id": _SAMPLE_ID, "receiver_id": _SAMPLE_ID},
+    ]}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ("messages", {"sender_id": _SAMPLE_ID, "receiver_id": _SAMPLE_ID, "read": False}, None),
+    ("projects", {"members.id": _SAMPLE_ID}, None),
+    ("projects", {"$or": [{"members.id": _SAMPLE_ID}, {"createdBy": _SAMPLE_ID}]}, None),
+    ("notes", {"project_id": ObjectId(_SAMPLE_ID)}, [("createdAt", DESCENDING)]),
+    ("notes", {"$text": {"$search": "sample"}, "project_id": {"$in": [ObjectId(_SAMPLE_ID)]}}, None),
+    ("task_messages", {"task_id": ObjectId(_SAMPLE_ID), "path": {"$regex": "^" + _SAMPLE_ID + "/"}},
+     [("path", ASCENDING)]),
+    ("mentions", {"user": _SAMPLE_USERNAME}, None),
+    ("mentions", {"user": _SAMPLE_USERNAME, "read": False}, [("created_at", DESCENDING), ("_id", DESCENDING)]),
+    # the _id branch can't come back in created_at order; one user's tasks are sorted in memory
+    ("tasks", {"$or": [
+        {"owner": _SAMPLE_USERNAME},
+        {"_id": {"$in": [ObjectId(_SAMPLE_ID)]}},
+    ]}, None),
+]
+
+
+async def ensure_indexes(db=None):
+    db = db if db is not None else database.get_db()
+    for collection, names in OBSOLETE_INDEXES.items():
+        existing = await db[collection].index_information()
+        for name in names:
+            if name in existing:
+                await db[collection].drop_index(name)
+
+    for collection, indexes in INDEXES.items():
+        for keys, options in indexes:
+            await db[collection].create_index(keys, **options)
+
+
+def _stages(plan):
+    """Yield every stage name in an explain plan tree"""
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            yield plan["stage"]
+        for value in plan.values():
+            yield from _stages(value)
+    elif isinstance(plan, list):
+        for item in plan:
+            yield from _stages(item)
+
+
+async def verify_query_plans(db=None):
+    """
+    Raise RuntimeError listing every hot query whose winning plan is a COLLSCAN,
+    or a blocking SORT for queries that come with a sort
+    """
+    db = db if db is not None else database.get_db()
+    failures = []
+    for collection, query, sort in HOT_QUERIES:
+        cursor = db[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        explain = await cursor.explain()
+        winning_plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+        stages = set(_stages(winning_plan))
+        if "COLLSCAN" in stages:
+            failures.append(f"COLLSCAN {collection}: {query}")
+        elif sort and "SORT" in stages:
+            failures.append(f"SORT {collection}: {query} by {sort}")
+
+    if failures:
+        raise RuntimeError("Hot queries without a usable index:\n" + "\n".join(failures))
+
+
+async def main():
+    await ensure_indexes()
+    await verify_query_plans()
+    print("Indexes applied, all hot queries use an index")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
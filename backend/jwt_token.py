@@ -1,7 +1,9 @@
 from datetime import datetime, timedelta, timezone
 from fastapi import HTTPException
 from jose import jwt, JWTError
-import schemas, database
+import os
+import schemas, database, metrics
+from cache import TTLCache
 
 
 
@@ -9,6 +11,18 @@ SECRET_KEY = "09d25e094faa6ca2556c818166b7a9563b93f7099f6f0f4caa6cf63b88e8d3e7"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# user documents keyed by token subject (email), so authenticated requests skip the users lookup
+user_cache = TTLCache(
+    max_size=int(os.getenv("USER_CACHE_MAX_SIZE", "1024")),
+    ttl=float(os.getenv("USER_CACHE_TTL_SECONDS", "60")),
+)
+metrics.register_cache("users", user_cache)
+
+
+def invalidate_user(email: str):
+    """Drop a cached user; call this whenever a user record changes."""
+    user_cache.invalidate(email)
+
 
 def create_access_token(data: dict, expires_delta: timedelta | None = None):
     to_encode = data.copy()
@@ -32,9 +46,13 @@ async def verify_token(token: str, credentials_exception: HTTPException):
     except JWTError:
         raise credentials_exception
 
-    user = await database.get_db()["users"].find_one({"email": email})
-
+    user = user_cache.get(email)
     if user is None:
-        raise credentials_exception
+        user = await database.get_db()["users"].find_one({"email": email})
+
+        if user is None:
+            raise credentials_exception
+
+        user_cache.set(email, user)
 
     return user  # return MongoDB dict
@@ -0,0 +1,54 @@
+"""
+Structured logging: one JSON object per line on stderr.
+
+Routine events are sampled at LOG_SAMPLE_RATE so hot paths don't pay for a log
+line on every request; warnings and errors are always written.
+"""
+import json
+import logging
+import os
+import random
+import sys
+import time
+import traceback
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "0.1"))
+
+logger = logging.getLogger("notesapp")
+logger.setLevel(LOG_LEVEL)
+logger.propagate = False
+if not logger.handlers:
+    _handler = logging.StreamHandler(sys.stderr)
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+
+
+def log(level: int, event: str, sample: float | None = None, **fields):
+    if not logger.isEnabledFor(level):
+        return
+
+    record = {"ts": round(time.time(), 3), "level": logging.getLevelName(level).lower(), "event": event}
+    if level < logging.WARNING:
+        rate = LOG_SAMPLE_RATE if sample is None else sample
+        if rate < 1:
+            if random.random() >= rate:
+                return
+            record["sample_rate"] = rate
+    record.update(fields)
+    logger.log(level, json.dumps(record, default=str))
+
+
+def info(event: str, sample: float | None = None, **fields):
+    log(logging.INFO, event, sample, **fields)
+
+
+def warning(event: str, **fields):
+    log(logging.WARNING, event, **fields)
+
+
+def error(event: str, exc: BaseException | None = None, **fields):
+    if exc is not None:
+        fields["error"] = f"{type(exc).__name__}: {exc}"
+        fields["traceback"] = "".join(traceback.format_exception(exc))
+    log(logging.ERROR, event, **fields)
@@ -1,14 +1,53 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, WebSocket, WebSocketDisconnect, status
 from fastapi.security import OAuth2PasswordRequestForm
-import models, database, schemas
+import models, database, schemas, indexes, assistant, search, realtime, responses, metrics, logs, tasks
+from responses import json_response
+from cache import TTLCache
 from authentication import login_user, get_current_user
 from bson import ObjectId
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from contextlib import asynccontextmanager
 from datetime import datetime
-from hashing import Hash
+from typing import List
+import asyncio
+import base64
+import re
+import hashlib
+import json
+from hashing import Hash, HashQueueFull
+from pymongo import DeleteOne, InsertOne, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 import jwt_token
+import os
+
+# the database handle is opened in lifespan; routes use this module global
+db = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global db
+    await database.warmup()
+    db = database.get_db()
+
+    await indexes.ensure_indexes(db)
+    if os.getenv("VERIFY_QUERY_PLANS") == "1":
+        await indexes.verify_query_plans(db)
+
+    await assistant.startup()
+    await realtime.startup()
+    try:
+        yield
+    finally:
+        await realtime.shutdown()
+        await assistant.shutdown()
+        database.close()
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan, default_response_class=responses.FastJSONResponse)
+
+app.add_middleware(responses.CompressionMiddleware, exclude_paths=["/llms"])
 
 app.add_middleware(
     CORSMiddleware,
@@ -18,40 +57,131 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-db = database.get_db()
+# outermost, so timings and sizes cover CORS and compression too
+app.add_middleware(metrics.MetricsMiddleware)
+
+
+@app.get("/health/live", include_in_schema=False)
+async def liveness():
+    return {"status": "ok"}
+
+
+@app.get("/health/ready", include_in_schema=False)
+async def readiness():
+    """Ready only while Mongo answers a ping; load balancers should route on this"""
+    if not await database.ping():
+        return json_response({"status": "unavailable", "mongo": False}, status_code=503)
+    return {"status": "ok", "mongo": True}
+
+
+# seconds a client has to send its auth frame after the socket opens
+WS_AUTH_TIMEOUT_SECONDS = float(os.getenv("WS_AUTH_TIMEOUT_SECONDS", "10"))
+
+@app.websocket("/ws")
+async def push_channel(websocket: WebSocket):
+    """
+    Authenticated push channel. Browsers cannot set headers on a WebSocket, and a query
+    parameter would land in the server's access log, so the access token comes in the
+    first frame as {"type": "auth", "token": ...}. Delivers new direct messages and task changes.
+    """
+    await websocket.accept()
+    try:
+        frame = await asyncio.wait_for(websocket.receive_json(), timeout=WS_AUTH_TIMEOUT_SECONDS)
+        if not isinstance(frame, dict) or frame.get("type") != "auth" or not isinstance(frame.get("token"), str):
+            raise HTTPException(status_code=401)
+        user = await jwt_token.verify_token(frame["token"], HTTPException(status_code=401))
+    except WebSocketDisconnect:
+        return
+    except (asyncio.TimeoutError, HTTPException, KeyError, ValueError):
+        await websocket.close(code=1008)
+        return
+
+    await realtime.hub.serve(websocket, [realtime.user_key(str(user["_id"])), realtime.name_key(user["username"])])
+
+
+@app.get("/metrics", include_in_schema=False)
+async def prometheus_metrics():
+    body, content_type = metrics.render()
+    return Response(body, media_type=content_type)
+
 
 @app.get('/users')
 async def get_users():
     users = []
     async for user in db['users'].find():
         users.append(schemas.get_user(user))
-    return users
+    return json_response(users)
+
+
+USER_SEARCH_PAGE_SIZE = 20
+MAX_USER_SEARCH_PAGE_SIZE = 50
+
+# pages keyed by (prefix, cursor, limit); short-lived, and cleared when someone registers
+user_search_cache = TTLCache(
+    max_size=int(os.getenv("USER_SEARCH_CACHE_MAX_SIZE", "512")),
+    ttl=float(os.getenv("USER_SEARCH_CACHE_TTL_SECONDS", "30")),
+)
+metrics.register_cache("user_search", user_search_cache)
+
+@app.get("/users/search")
+async def search_users(
+    q: str = Query(..., min_length=1, max_length=100),
+    after: str | None = None,
+    limit: int = Query(USER_SEARCH_PAGE_SIZE, ge=1, le=MAX_USER_SEARCH_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Directory lookup for member pickers and @mention completion. Prefix match on
+    username, email, name or any word of the name, ordered by username.
+    next_cursor is the username to pass back as after.
+    """
+    prefix = search.normalize_prefix(q)
+    if not prefix:
+        raise HTTPException(status_code=400, detail="Empty search")
+
+    key = (prefix, after, limit)
+    page = user_search_cache.get(key)
+    if page is None:
+        query = {"search_keys": {"$regex": search.prefix_regex(prefix)}}
+        if after:
+            query["username"] = {"$gt": after}
+
+        users = await db.users.find(
+            query, {"name": 1, "username": 1, "email": 1}
+        ).sort("username", 1).hint("users_search").limit(limit + 1).to_list(None)
+
+        page = {
+            "users": [schemas.get_user(user) for user in users[:limit]],
+            "next_cursor": users[limit - 1]["username"] if len(users) > limit else None,
+        }
+        user_search_cache.set(key, page)
+
+    return json_response(page)
 
 
 @app.post("/register")
 async def register(user: models.UserCreate):
 
-    existing_user = await db["users"].find_one({
-        "$or": [
-            {"email": user.email},
-            {"username": user.username}
-        ]
-    })
-    if existing_user:
-        if existing_user.get("email") == user.email:
+    try:
+        hashed_password = await Hash.bcrypt_async(user.password)
+    except HashQueueFull:
+        raise HTTPException(status_code=503, detail="Server busy, please retry", headers={"Retry-After": "1"})
+    # email and username carry unique indexes, so the insert itself rejects duplicates
+    try:
+        await db["users"].insert_one({
+            "name": user.name,
+            "email": user.email,
+            "username": user.username,
+            "password": hashed_password,
+            "search_keys": search.user_search_keys(user.name, user.username, user.email),
+        })
+    except DuplicateKeyError as e:
+        if "email" in (e.details or {}).get("keyPattern", {}):
             raise HTTPException(status_code=400, detail="Email already registered")
-        if existing_user.get("username") == user.username:
-            raise HTTPException(status_code=400, detail="Username already taken")
-
-
-    hashed_password = Hash.bcrypt(user.password)
-    await db["users"].insert_one({
-        "name": user.name,
-        "email": user.email,
-        "username": user.username,
-        "password": hashed_password,
-    })
+        raise HTTPException(status_code=400, detail="Username already taken")
 
+    user_search_cache.clear()
+    jwt_token.invalidate_user(user.email)
     return {"message": "User registered successfully"}
 
 @app.post("/login")
@@ -76,19 +206,43 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
 #         projects.append(schemas.get_project(project))
 #     return projects
 
+PROJECT_LIST_FIELDS = {"title": 1, "description": 1, "createdBy": 1, "createdAt": 1}
+
 @app.get("/projects")
 async def get_projects(
+    summary: bool = False,
     current_user: dict = Depends(get_current_user)
 ):
+    """
+    Projects the current user belongs to, each with a note count.
+    summary=true returns a member count instead of the members array.
+    """
     user_id = str(current_user["_id"])
 
+    if summary:
+        fields = {**PROJECT_LIST_FIELDS, "member_count": {"$size": {"$ifNull": ["$members", []]}}}
+    else:
+        fields = {**PROJECT_LIST_FIELDS, "members": 1}
+
+    pipeline = [
+        {"$match": {"members.id": user_id}},
+        {"$project": fields},
+        {"$lookup": {
+            "from": "notes",
+            "localField": "_id",
+            "foreignField": "project_id",
+            "pipeline": [{"$count": "count"}],
+            "as": "note_count",
+        }},
+        {"$set": {"note_count": {"$ifNull": [{"$first": "$note_count.count"}, 0]}}},
+    ]
+
+    to_response = schemas.get_project_summary if summary else schemas.get_project
     projects = []
-    async for project in db["projects"].find({
-        "members.id": user_id
-    }):
-        projects.append(schemas.get_project(project))
+    async for project in database.get_list_db()["projects"].aggregate(pipeline):
+        projects.append(to_response(project))
 
-    return projects
+    return json_response(projects)
 
 
 @app.post("/projects")
@@ -104,9 +258,9 @@ async def create_project(
         "email": current_user["email"]
     }]
 
-    project_dict["notes"] = []
     project_dict['createdBy'] = str(current_user['_id'])
     project_dict["createdAt"] = datetime.utcnow().replace(microsecond=0)
+    project_dict["version"] = 1
 
     result = await db["projects"].insert_one(project_dict)
     # print(project_dict)
@@ -117,90 +271,367 @@ async def create_project(
     }
 
 
-@app.get('/projects/{project_id}')
-async def get_project_by_id(
-    project_id: str,
-    current_user: dict = Depends(get_current_user)
-):
+# ------------------ CONDITIONAL GET ------------------
+# Documents behind cacheable reads carry a version counter that every write path
+# bumps. The ETag is derived from versions alone, so a matching If-None-Match is
+# answered with 304 before anything is loaded or serialized.
+def weak_etag(*parts) -> str:
+    digest = hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    # weak comparison: the W/ prefix is ignored on both sides
+    strip = lambda tag: tag.strip().removeprefix("W/")
+    return strip(etag) in {strip(tag) for tag in header.split(",")}
+
+def set_etag(response: Response, etag: str):
+    response.headers["ETag"] = etag
+    # let browsers keep the body but revalidate on every use
+    response.headers["Cache-Control"] = "private, no-cache"
+
+def not_modified(etag: str) -> Response:
+    response = Response(status_code=304)
+    set_etag(response, etag)
+    return response
+
+async def bump_project_version(project_object_id: ObjectId):
+    await db.projects.update_one({"_id": project_object_id}, {"$inc": {"version": 1}})
+
+def conversation_key(user_a: str, user_b: str) -> str:
+    return ":".join(sorted([user_a, user_b]))
+
+async def bump_conversation_version(user_a: str, user_b: str):
+    await db.conversations.update_one(
+        {"_id": conversation_key(user_a, user_b)}, {"$inc": {"version": 1}}, upsert=True
+    )
+
+
+NOTE_PREVIEW_LENGTH = 100
+
+def parse_object_id(value: str, name: str) -> ObjectId:
     try:
-        project_object_id = ObjectId(project_id)
+        return ObjectId(value)
     except Exception:
-        raise HTTPException(status_code=400, detail="Invalid project ID")
+        raise HTTPException(status_code=400, detail=f"Invalid {name} ID")
 
+async def get_member_project(project_id: str, current_user: dict, projection: dict | None = None):
+    """Return the project if the current user is a member or its creator, else 404"""
     user_id = str(current_user["_id"])
 
     project = await db.projects.find_one({
-        "_id": project_object_id,
+        "_id": parse_object_id(project_id, "project"),
         "$or": [
             {"members.id": user_id},
             {"createdBy": user_id}  # allow creator to fetch
         ]
-    })
-
-    # print("Fetching project for user_id:", user_id)
-    # print("Project found:", project)
+    }, projection)
 
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
 
+    return project
+
+async def get_note_summaries(project_object_id: ObjectId):
+    """Notes of a project without their bodies, only a short preview"""
+    pipeline = [
+        {"$match": {"project_id": project_object_id}},
+        {"$sort": {"createdAt": -1}},
+        {"$project": {
+            "title": 1,
+            "createdAt": 1,
+            "preview": {"$substrCP": ["$body", 0, NOTE_PREVIEW_LENGTH]},
+            "truncated": {"$gt": [{"$strLenCP": "$body"}, NOTE_PREVIEW_LENGTH]},
+        }},
+    ]
+    notes = await db.notes.aggregate(pipeline).to_list(None)
+    for note in notes:
+        note["id"] = str(note.pop("_id"))
+    return notes
+
+
+@app.get('/projects/{project_id}')
+async def get_project_by_id(
+    project_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    project = await get_member_project(project_id, current_user)
+
+    # notes and membership writes bump the project's version
+    etag = weak_etag("project", project_id, project.get("version", 0))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    # 🔹 Note summaries; bodies are fetched per note
+    project["notes"] = await get_note_summaries(project["_id"])
+
     # 🔹 Project ID
     project["id"] = str(project["_id"])
     del project["_id"]
 
-    # 🔹 Notes IDs
-    for note in project.get("notes", []):
-        note["id"] = str(note["_id"])
-        del note["_id"]
+    response = json_response(project)
+    set_etag(response, etag)
+    return response
 
-    return project
 
+@app.get("/projects/{project_id}/notes/{note_id}")
+async def get_note(project_id: str, note_id: str, current_user: dict = Depends(get_current_user)):
+    project = await get_member_project(project_id, current_user, {"_id": 1})
 
-    
+    note = await db.notes.find_one({
+        "_id": parse_object_id(note_id, "note"),
+        "project_id": project["_id"],
+    })
+    if not note:
+        raise HTTPException(status_code=404, detail="Note not found")
+
+    return schemas.get_note(note)
 
 @app.post("/projects/{project_id}/notes")
-async def add_note(project_id: str, note: models.NoteCreate, current_user: models.User = Depends(get_current_user)):
+async def add_note(project_id: str, note: models.NoteCreate, current_user: dict = Depends(get_current_user)):
+    project = await get_member_project(project_id, current_user, {"_id": 1})
+
     note_dict = note.model_dump()
-    note_dict["_id"] = ObjectId()
+    note_dict["project_id"] = project["_id"]
     note_dict["createdAt"] = datetime.utcnow().replace(microsecond=0)
     # print(note_dict)
-    await db["projects"].update_one(
-        {"_id": ObjectId(project_id)},
-        {"$push": {"notes": note_dict}}
-    )
+    result = await db["notes"].insert_one(note_dict)
+    await bump_project_version(project["_id"])
 
     return {
         "message": "Note added",
-        "note_id": str(note_dict["_id"])  # return note ID to frontend
+        "note_id": str(result.inserted_id)  # return note ID to frontend
     }
 
 @app.put("/projects/{project_id}/notes/{note_id}")
-async def update_note(project_id: str, note_id: str, note: models.NoteCreate, current_user: models.User = Depends(get_current_user)):
-    await db["projects"].update_one(
+async def update_note(project_id: str, note_id: str, note: models.NoteCreate, current_user: dict = Depends(get_current_user)):
+    project = await get_member_project(project_id, current_user, {"_id": 1})
+
+    result = await db["notes"].update_one(
         {
-            "_id": ObjectId(project_id),
-            "notes._id": ObjectId(note_id),
+            "_id": parse_object_id(note_id, "note"),
+            "project_id": project["_id"],
         },
         {
             "$set": {
-                "notes.$.title": note.title,
-                "notes.$.body": note.body,
-                "notes.$.createdAt": datetime.utcnow().replace(microsecond=0),
+                "title": note.title,
+                "body": note.body,
+                "createdAt": datetime.utcnow().replace(microsecond=0),
             }
         }
     )
+    if result.matched_count == 0:
+        raise HTTPException(status_code=404, detail="Note not found")
+    await bump_project_version(project["_id"])
 
     return {"message": "Note updated"}
 
 @app.delete("/projects/{project_id}/notes/{note_id}")
-async def delete_note(project_id: str, note_id: str, current_user: models.User = Depends(get_current_user)):
-    result = await db.projects.update_one(
-        {"_id": ObjectId(project_id)},
-        {"$pull": {"notes": {"_id": ObjectId(note_id)}}}
-    )
-    if result.modified_count == 0:
+async def delete_note(project_id: str, note_id: str, current_user: dict = Depends(get_current_user)):
+    project = await get_member_project(project_id, current_user, {"_id": 1})
+
+    result = await db.notes.delete_one({
+        "_id": parse_object_id(note_id, "note"),
+        "project_id": project["_id"],
+    })
+    if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Note not found")
+    await bump_project_version(project["_id"])
     return {"message": "Note deleted successfully"}
 
+@app.post("/projects/{project_id}/notes/batch")
+async def batch_notes(project_id: str, batch: models.NoteBatch, current_user: dict = Depends(get_current_user)):
+    """
+    Create, update and delete many notes in one bulk_write. Results come back in
+    request order; with ordered=true everything after the first failure is skipped.
+    """
+    project = await get_member_project(project_id, current_user, {"_id": 1})
+    project_object_id = project["_id"]
+    now = datetime.utcnow().replace(microsecond=0)
+
+    # bulk_write only reports totals, so find which targeted notes exist up front
+    targets = {
+        i: parse_object_id(op.id, "note")
+        for i, op in enumerate(batch.operations) if op.op != "create"
+    }
+    existing = set()
+    if targets:
+        async for note in db.notes.find(
+            {"_id": {"$in": list(targets.values())}, "project_id": project_object_id}, {"_id": 1}
+        ):
+            existing.add(note["_id"])
+
+    results = []
+    requests = []
+    request_ops = []  # index in batch.operations for each entry of requests
+    for i, op in enumerate(batch.operations):
+        if op.op == "create":
+            note_id = ObjectId()
+            requests.append(InsertOne({
+                "_id": note_id,
+                "title": op.title,
+                "body": op.body,
+                "project_id": project_object_id,
+                "createdAt": now,
+            }))
+            results.append({"op": "create", "id": str(note_id), "status": "created"})
+            request_ops.append(i)
+            continue
+
+        note_id = targets[i]
+        if note_id not in existing:
+            results.append({"op": op.op, "id": op.id, "status": "not_found"})
+            continue
+
+        if op.op == "update":
+            fields = {"createdAt": now}
+            if op.title is not None:
+                fields["title"] = op.title
+            if op.body is not None:
+                fields["body"] = op.body
+            requests.append(UpdateOne({"_id": note_id, "project_id": project_object_id}, {"$set": fields}))
+            results.append({"op": "update", "id": op.id, "status": "updated"})
+        else:
+            requests.append(DeleteOne({"_id": note_id, "project_id": project_object_id}))
+            results.append({"op": "delete", "id": op.id, "status": "deleted"})
+            # later operations in this batch can no longer see it
+            existing.discard(note_id)
+        request_ops.append(i)
+
+    written = 0
+    write_concern_errors = []
+    if requests:
+        try:
+            result = await db.notes.bulk_write(requests, ordered=batch.ordered)
+            written = result.inserted_count + result.modified_count + result.deleted_count
+        except BulkWriteError as e:
+            details = e.details
+            written = details["nInserted"] + details["nModified"] + details["nRemoved"]
+            failed = {}
+            for error in details["writeErrors"]:
+                failed[request_ops[error["index"]]] = error["errmsg"]
+            for i, message in failed.items():
+                results[i]["status"] = "failed"
+                results[i]["error"] = message
+            if batch.ordered and failed:
+                first_failed = min(failed)
+                for i in request_ops:
+                    if i > first_failed:
+                        results[i]["status"] = "skipped"
+            # the writes were applied but not acknowledged by the requested write concern
+            # (MONGO_WRITE_CONCERN / MONGO_WRITE_TIMEOUT_MS); they may still replicate
+            write_concern_errors = [error["errmsg"] for error in details.get("writeConcernErrors", [])]
+
+    if written:
+        await bump_project_version(project_object_id)
+
+    counts = {}
+    for entry in results:
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    return {
+        "ordered": batch.ordered,
+        "counts": counts,
+        "results": results,
+        "write_concern_errors": write_concern_errors,
+    }
+
+
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 50
+# every page re-reads offset + limit scored matches per collection, so deep paging is capped
+MAX_SEARCH_OFFSET = 200
+
+@app.get("/search")
+async def search_notes_and_tasks(
+    q: str = Query(..., min_length=1),
+    offset: int = Query(0, ge=0, le=MAX_SEARCH_OFFSET),
+    limit: int = Query(SEARCH_PAGE_SIZE, ge=1, le=MAX_SEARCH_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Ranked full-text search over notes in the user's projects and over the titles
+    and messages of tasks they own or are mentioned in. Backed by text indexes.
+    Results past MAX_SEARCH_OFFSET are not reachable; refine the query instead.
+    """
+    user_id = str(current_user["_id"])
+    username = current_user["username"]
+    pattern = search.highlight_pattern(search.query_terms(q))
+    window = offset + limit + 1
+    score = {"score": {"$meta": "textScore"}}
+
+    project_titles = {}
+    async for project in db.projects.find({"members.id": user_id}, {"title": 1}):
+        project_titles[project["_id"]] = project["title"]
+
+    results = []
+    if project_titles:
+        async for note in db.notes.find(
+            {"$text": {"$search": q}, "project_id": {"$in": list(project_titles)}},
+            {"title": 1, "body": 1, "project_id": 1, "createdAt": 1, **score},
+        ).sort([("score", {"$meta": "textScore"})]).limit(window):
+            match = search.make_snippet(note["body"], pattern) or search.make_snippet(note["title"], pattern)
+            results.append({
+                "type": "note",
+                "id": str(note["_id"]),
+                "project_id": str(note["project_id"]),
+                "project_title": project_titles.get(note["project_id"], ""),
+                "title": note["title"],
+                "createdAt": note["createdAt"],
+                "score": note["score"],
+                **(match or {"snippet": note["body"][:search.SNIPPET_LENGTH], "highlights": []}),
+            })
+
+    task_titles = {}
+    async for task in db.tasks.find(
+        {"$or": [{"owner": username}, {"mentioned_users": username}]}, {"title": 1}
+    ):
+        task_titles[task["_id"]] = task["title"]
+
+    if task_titles:
+        async for task in db.tasks.find(
+            {"$text": {"$search": q}, "_id": {"$in": list(task_titles)}},
+            {"title": 1, "created_at": 1, **score},
+        ).sort([("score", {"$meta": "textScore"})]).limit(window):
+            results.append({
+                "type": "task",
+                "id": str(task["_id"]),
+                "title": task["title"],
+                "created_at": task["created_at"],
+                "score": task["score"],
+                **(search.make_snippet(task["title"], pattern) or {"snippet": task["title"], "highlights": []}),
+            })
+
+        async for msg in db.task_messages.find(
+            {"$text": {"$search": q}, "task_id": {"$in": list(task_titles)}},
+            {"id": 1, "task_id": 1, "text": 1, "sender": 1, "timestamp": 1, **score},
+        ).sort([("score", {"$meta": "textScore"})]).limit(window):
+            results.append({
+                "type": "task_message",
+                "id": msg["id"],
+                "task_id": str(msg["task_id"]),
+                "task_title": task_titles.get(msg["task_id"], ""),
+                "sender": msg["sender"],
+                "timestamp": msg["timestamp"],
+                "score": msg["score"],
+                **(search.make_snippet(msg["text"], pattern)
+                   or {"snippet": msg["text"][:search.SNIPPET_LENGTH], "highlights": []}),
+            })
+
+    results.sort(key=lambda r: r["score"], reverse=True)
+    page = results[offset:offset + limit]
+
+    return json_response({
+        "results": page,
+        "offset": offset,
+        "limit": limit,
+        "has_more": len(results) > offset + limit and offset + limit <= MAX_SEARCH_OFFSET,
+    })
+
 
 @app.post("/projects/{project_id}/members")
 async def add_member(project_id: str, member: models.AddMember, current_user: dict = Depends(get_current_user)):
@@ -208,109 +639,265 @@ async def add_member(project_id: str, member: models.AddMember, current_user: di
     Add a member to a project by email.
     Only the project creator can add members.
     """
-    try:
-        project_object_id = ObjectId(project_id)
-    except Exception:
-        raise HTTPException(status_code=400, detail="Invalid project ID")
-
-    project = await db.projects.find_one({"_id": project_object_id})
-    if not project:
-        raise HTTPException(status_code=404, detail="Project not found")
+    outcome = (await add_project_members(project_id, [member.email], current_user))[0]
 
-    if project["createdBy"] != str(current_user["_id"]):
-        raise HTTPException(status_code=403, detail="Only the creator can add members")
-
-    # Check if user exists
-    user = await db.users.find_one({"email": member.email})
-    if not user:
+    if outcome["status"] == "not_found":
         raise HTTPException(status_code=404, detail="User with this email not found")
-
-    # Check if already a member
-    if any(m["id"] == str(user["_id"]) for m in project.get("members", [])):
+    if outcome["status"] == "already_member":
         raise HTTPException(status_code=400, detail="User is already a member")
 
-    # Add member
-    new_member = {"id": str(user["_id"]), "name": user['name'], "email": user["email"]}
-    await db.projects.update_one(
-        {"_id": project_object_id},
-        {"$push": {"members": new_member}}
-    )
-
     return {
         "message": f"{member.email} added",
-        "member": {
-            "id": str(user["_id"]),
-            "name": new_member["name"],
-            "email": user["email"]
-        }
+        "member": outcome["member"],
     }
+
+
+@app.post("/projects/{project_id}/members/bulk")
+async def add_members(project_id: str, invite: models.BulkInvite, current_user: dict = Depends(get_current_user)):
+    """Add many members by email at once; only the project creator can. Outcomes are per email."""
+    results = await add_project_members(project_id, invite.emails, current_user)
+
+    counts = {}
+    for entry in results:
+        counts[entry["status"]] = counts.get(entry["status"], 0) + 1
+    return {"counts": counts, "results": results}
+
+
+async def add_project_members(project_id: str, emails: List[str], current_user: dict):
+    """
+    Resolve emails with one $in query, then append the users that aren't members yet
+    in one conditional update. The membership test runs inside the update, so
+    concurrent adds can't create duplicates.
+    """
+    project_object_id = parse_object_id(project_id, "project")
+    emails = list(dict.fromkeys(email.strip() for email in emails))
+
+    users = {}
+    async for user in db.users.find({"email": {"$in": emails}}, {"name": 1, "email": 1}):
+        users[user["email"]] = {"id": str(user["_id"]), "name": user["name"], "email": user["email"]}
+    candidates = list(users.values())
+
+    # pipeline update: pick the candidates whose id isn't a member yet, append them
+    # and bump the version only if any were added
+    before = await db.projects.find_one_and_update(
+        {"_id": project_object_id, "createdBy": str(current_user["_id"])},
+        [
+            {"$set": {"_added": {"$filter": {
+                # $literal so user-supplied names can't be read as field paths
+                "input": {"$literal": candidates},
+                "cond": {"$not": [{"$in": ["$$this.id", {"$ifNull": ["$members.id", []]}]}]},
+            }}}},
+            {"$set": {
+                "members": {"$concatArrays": [{"$ifNull": ["$members", []]}, "$_added"]},
+                "version": {"$add": [
+                    {"$ifNull": ["$version", 0]},
+                    {"$cond": [{"$gt": [{"$size": "$_added"}, 0]}, 1, 0]},
+                ]},
+            }},
+            {"$unset": "_added"},
+        ],
+        projection={"members.id": 1},
+    )
+
+    if before is None:
+        # only the failure path pays for telling the two cases apart
+        if await db.projects.count_documents({"_id": project_object_id}, limit=1):
+            raise HTTPException(status_code=403, detail="Only the creator can add members")
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    member_ids = {m["id"] for m in before.get("members", [])}
+    results = []
+    for email in emails:
+        user = users.get(email)
+        if user is None:
+            results.append({"email": email, "status": "not_found"})
+        elif user["id"] in member_ids:
+            results.append({"email": email, "status": "already_member"})
+        else:
+            results.append({"email": email, "status": "added", "member": user})
+    return results
     
 
-@app.get("/messages")
-async def get_my_messages(current_user: dict = Depends(get_current_user)):
-    user_id = str(current_user["_id"])
+async def attach_sender_names(messages):
+    """Fill sender_name on each message with a single $in lookup over the distinct senders"""
+    sender_ids = set()
+    for msg in messages:
+        try:
+            sender_ids.add(ObjectId(msg["sender_id"]))
+        except Exception:
+            pass
 
-    messages = await db.messages.find({
-        "$or": [
-            {"sender_id": user_id},
-            {"receiver_id": user_id},
-        ]
-    }).sort("created_at", 1).to_list(1000)
+    names = {}
+    if sender_ids:
+        async for user in db.users.find({"_id": {"$in": list(sender_ids)}}, {"name": 1}):
+            names[str(user["_id"])] = user.get("name", "Unknown")
 
-    # Add sender_name to each message
     for msg in messages:
-        sender = await db.users.find_one({"_id": ObjectId(msg["sender_id"])})
         msg["_id"] = str(msg["_id"])
-        msg["sender_name"] = sender["name"] if sender else "Unknown"
+        msg["sender_name"] = names.get(msg["sender_id"], "Unknown")
 
     return messages
 
-@app.get("/messages/conversations")
-async def get_conversations(current_user: dict = Depends(get_current_user)):
+
+MESSAGE_PAGE_SIZE = 50
+MAX_MESSAGE_PAGE_SIZE = 200
+
+def encode_cursor(msg) -> str:
+    """Opaque cursor for a message, keyed on (created_at, _id)"""
+    raw = f"{msg['created_at'].isoformat()}|{msg['_id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, message_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        return datetime.fromisoformat(created_at), ObjectId(message_id)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def paginate_messages(query: dict, before: str | None, after: str | None, limit: int):
+    """
+    Keyset pagination over messages ordered by (created_at, _id).
+    Without a cursor the latest page is returned. `before` walks back in history,
+    `after` walks forward. Each page is returned oldest first.
+    """
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either before or after, not both")
+
+    direction = 1 if after else -1
+    if before or after:
+        created_at, message_id = decode_cursor(before or after)
+        op = "$gt" if after else "$lt"
+        query = {"$and": [query, {"$or": [
+            {"created_at": {op: created_at}},
+            {"created_at": created_at, "_id": {op: message_id}},
+        ]}]}
+
+    messages = await db.messages.find(query).sort(
+        [("created_at", direction), ("_id", direction)]
+    ).limit(limit + 1).to_list(limit + 1)
+
+    has_more = len(messages) > limit
+    messages = messages[:limit]
+    next_cursor = encode_cursor(messages[-1]) if has_more else None
+    if direction == -1:
+        messages.reverse()
+
+    return {
+        "messages": await attach_sender_names(messages),
+        "next_cursor": next_cursor,
+    }
+
+
+@app.get("/messages")
+async def get_my_messages(
+    before: str | None = None,
+    after: str | None = None,
+    limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=MAX_MESSAGE_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user),
+):
     user_id = str(current_user["_id"])
 
-    # Find distinct senders who have messages with current user
-    messages = await db.messages.find({
+    return json_response(await paginate_messages({
         "$or": [
             {"sender_id": user_id},
             {"receiver_id": user_id},
         ]
-    }).to_list(1000)
+    }, before, after, limit))
 
-    # Collect unique user IDs
-    user_ids = set()
-    for msg in messages:
-        if msg["sender_id"] != user_id:
-            user_ids.add(msg["sender_id"])
-        if msg["receiver_id"] != user_id:
-            user_ids.add(msg["receiver_id"])
+CONVERSATION_PREVIEW_LENGTH = 100
 
-    # Fetch user names
-    users = []
-    for uid in user_ids:
-        user = await db.users.find_one({"_id": ObjectId(uid)})
-        if user:
-            users.append({"_id": str(user["_id"]), "name": user["name"]})
+@app.get("/messages/conversations")
+async def get_conversations(current_user: dict = Depends(get_current_user)):
+    user_id = str(current_user["_id"])
 
-    return users
+    pipeline = [
+        {"$match": {
+            "$or": [
+                {"sender_id": user_id},
+                {"receiver_id": user_id},
+            ]
+        }},
+        {"$sort": {"created_at": -1}},
+        {"$group": {
+            "_id": {
+                "$cond": [{"$eq": ["$sender_id", user_id]}, "$receiver_id", "$sender_id"]
+            },
+            "last_message": {"$first": "$content"},
+            "last_message_at": {"$first": "$created_at"},
+            "last_sender_id": {"$first": "$sender_id"},
+            "unread_count": {"$sum": {
+                "$cond": [
+                    {"$and": [
+                        {"$eq": ["$receiver_id", user_id]},
+                        # messages from before read tracking have no read field and count as read
+                        {"$eq": ["$read", False]},
+                    ]},
+                    1,
+                    0,
+                ]
+            }},
+        }},
+        {"$sort": {"last_message_at": -1}},
+        {"$addFields": {
+            "peer_oid": {"$convert": {"input": "$_id", "to": "objectId", "onError": None, "onNull": None}}
+        }},
+        {"$lookup": {
+            "from": "users",
+            "localField": "peer_oid",
+            "foreignField": "_id",
+            "as": "peer",
+        }},
+        {"$unwind": "$peer"},
+        {"$project": {
+            "_id": 1,
+            "name": "$peer.name",
+            "last_message": {"$substrCP": ["$last_message", 0, CONVERSATION_PREVIEW_LENGTH]},
+            "last_message_at": 1,
+            "last_sender_id": 1,
+            "unread_count": 1,
+        }},
+    ]
+
+    return json_response(await db.messages.aggregate(pipeline).to_list(None))
 
 @app.get("/messages/{other_user_id}")
-async def get_messages_with_user(other_user_id: str, current_user: dict = Depends(get_current_user)):
+async def get_messages_with_user(
+    other_user_id: str,
+    request: Request,
+    before: str | None = None,
+    after: str | None = None,
+    limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=MAX_MESSAGE_PAGE_SIZE),
+    current_user: dict = Depends(get_current_user),
+):
     user_id = str(current_user["_id"])
 
-    messages = await db.messages.find({
+    key = conversation_key(user_id, other_user_id)
+    conversation = await db.conversations.find_one({"_id": key}) or {}
+    version = conversation.get("version", 0)
+    etag = weak_etag("messages", key, version, before, after, limit)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    # Opening a conversation marks everything the other user sent as read;
+    # done before the page is read so the body matches the version it is tagged with
+    marked = await db.messages.update_many(
+        {"sender_id": other_user_id, "receiver_id": user_id, "read": False},
+        {"$set": {"read": True}}
+    )
+    if marked.modified_count:
+        await bump_conversation_version(user_id, other_user_id)
+        version += 1
+
+    page = await paginate_messages({
         "$or": [
             {"sender_id": user_id, "receiver_id": other_user_id},
             {"sender_id": other_user_id, "receiver_id": user_id}
         ]
-    }).sort("created_at", 1).to_list(1000)
-
-    for msg in messages:
-        sender = await db.users.find_one({"_id": ObjectId(msg["sender_id"])})
-        msg["_id"] = str(msg["_id"])
-        msg["sender_name"] = sender["name"] if sender else "Unknown"
+    }, before, after, limit)
 
-    return messages
+    response = json_response(page)
+    set_etag(response, weak_etag("messages", key, version, before, after, limit))
+    return response
 
 
 @app.post("/messages")
@@ -323,30 +910,51 @@ async def send_message(
         "receiver_id": message.receiver_id,
         "content": message.content,
         "created_at": datetime.utcnow(),
+        "read": False,
     }
 
     result = await db.messages.insert_one(msg)
     msg["_id"] = str(result.inserted_id)
-    return msg
+    await bump_conversation_version(msg["sender_id"], msg["receiver_id"])
 
-from typing import List
+    await realtime.publish(
+        [realtime.user_key(msg["receiver_id"]), realtime.user_key(msg["sender_id"])],
+        {"type": "message", "message": {**msg, "sender_name": current_user["name"]}},
+    )
+    return msg
 
 
 @app.get("/tasks", response_model=List[models.Task])
-async def get_my_tasks(current_user=Depends(get_current_user)):
+async def get_my_tasks(request: Request, current_user=Depends(get_current_user)):
     username = current_user["username"]
+    # may be served by a secondary (MONGO_SECONDARY_LIST_READS), so a just-written task can lag
+    read_db = database.get_list_db()
 
-    cursor = db["tasks"].find({
+    # mentioned tasks come from the mentions collection rather than a multikey scan
+    mentioned_task_ids = await read_db.mentions.distinct("task_id", {"user": username})
+
+    # only ids and versions are needed to answer a conditional request
+    cursor = read_db["tasks"].find({
         "$or": [
             {"owner": username},
-            {"mentioned_users": username}
+            {"_id": {"$in": mentioned_task_ids}}
         ]
-    }).sort("created_at", -1)  # Sort by newest first
+    }, {"_id": 1, "version": 1}).sort("created_at", -1)  # Sort by newest first
+    task_versions = await cursor.to_list(None)
 
-    tasks = []
-    async for task_doc in cursor:
-        tasks.append(schemas.get_task(task_doc))
-    return tasks
+    # the list changes when a visible task is written or the visible set changes
+    etag = weak_etag("tasks", *(f"{doc['_id']}.{doc.get('version', 0)}" for doc in task_versions))
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    task_ids = [doc["_id"] for doc in task_versions]
+    by_id = {doc["_id"]: doc async for doc in read_db["tasks"].find({"_id": {"$in": task_ids}})}
+    task_docs = [by_id[task_id] for task_id in task_ids if task_id in by_id]
+
+    # schemas.get_task already matches models.Task, so the response_model pass is skipped
+    response = json_response([schemas.get_task(task_doc) for task_doc in task_docs])
+    set_etag(response, etag)
+    return response
 
 # ------------------ CREATE TASK ------------------
 @app.post("/tasks")
@@ -354,7 +962,8 @@ async def create_task(task: models.TaskCreate, current_user=Depends(get_current_
     task_doc = {
         "title": task.title,
         "status": task.status,
-        "messages": [],
+        "message_count": 0,
+        "version": 1,
         "owner": current_user['username'],
         "created_at": task.created_at
     }
@@ -362,154 +971,300 @@ async def create_task(task: models.TaskCreate, current_user=Depends(get_current_
     result = await db["tasks"].insert_one(task_doc)
     task_doc["_id"] = result.inserted_id
 
+    await realtime.publish([realtime.name_key(task_doc["owner"])], {"type": "task", "task": schemas.get_task(task_doc)})
     return schemas.get_task(task_doc)
 
 
 
 # ------------------ UPDATE TASK ------------------
-import re
-def extract_mentions(text: str):
-    """Return list of usernames mentioned in text."""
-    return re.findall(r"@(\w+)", text)
-
-def extract_mentions_from_messages(messages):
-    """Recursively extract mentions from all messages and replies"""
-    mentioned = set()
-    for msg in messages:
-        mentioned.update(extract_mentions(msg.text))
-        if msg.replies:
-            mentioned.update(extract_mentions_from_messages(msg.replies))
-    return mentioned
-
-def message_to_dict(msg: models.TaskMessage):
-    """Convert TaskMessage to dict recursively"""
-    return {
-        "id": msg.id,
-        "text": msg.text,
-        "sender": msg.sender,
-        "timestamp": msg.timestamp,
-        "parentId": msg.parentId,
-        "replies": [message_to_dict(reply) for reply in msg.replies]
-    }
-
 @app.put("/tasks/{task_id}", response_model=models.Task)
 async def update_task(task_id: str, task: models.TaskUpdate, current_user=Depends(get_current_user)):
     try:
-        print(f"Updating task {task_id}")
-        print(f"Current user: {current_user['username']}")
-        print(f"Task data received: {task.model_dump()}")
-        
-        # Extract mentioned users from all messages (including nested replies)
-        mentioned_users = extract_mentions_from_messages(task.messages)
-        print(f"Mentioned users: {mentioned_users}")
-
-        # Convert messages to dict format for MongoDB
-        messages_dict = [message_to_dict(msg) for msg in task.messages]
-        print(f"Converted messages: {len(messages_dict)} top-level messages")
+        task_object_id = parse_object_id(task_id, "task")
+
+        # authors of rows we already have are kept; anything new was written by this user
+        sender_usernames = {}
+        async for row in db.task_messages.find({"task_id": task_object_id}, {"id": 1, "sender_username": 1}):
+            sender_usernames[row["id"]] = row.get("sender_username")
+
+        # Flatten the tree into task_messages rows, collecting mentions on the way.
+        # This validates ids too, so a bad tree is rejected before anything is written.
+        try:
+            messages_docs, mentioned_users = tasks.flatten_messages(
+                task_object_id, task.messages, sender_usernames, current_user["username"]
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         task_data = {
             "title": task.title,
             "status": task.status,
-            "messages": messages_dict,
+            "message_count": len(messages_docs),
             "mentioned_users": list(mentioned_users)
         }
 
         # Update in MongoDB - check both owner and mentioned_users
         result = await db["tasks"].find_one_and_update(
-            {
-                "_id": ObjectId(task_id),
-                "$or": [
-                    {"owner": current_user['username']},
-                    {"mentioned_users": current_user['username']}
-                ]
-            },
-            {"$set": task_data},
+            task_access_filter(task_id, current_user['username']),
+            {"$set": task_data, "$unset": {"messages": ""}},
             return_document=True
         )
 
         if not result:
-            print(f"Task not found for task_id: {task_id}, user: {current_user['username']}")
             raise HTTPException(status_code=404, detail="Task not found or you don't have permission")
 
-        print("Task updated successfully")
-        return schemas.get_task(result)
+        # The whole thread was sent, so it replaces the stored one
+        await db.task_messages.delete_many({"task_id": task_object_id})
+        if messages_docs:
+            await db.task_messages.insert_many(messages_docs)
+        # mentioned_users was recomputed from the tree above; rows follow the same tree
+        await tasks.prune_mentions(db, task_object_id, messages_docs)
+        await tasks.record_mentions(db, task_object_id, messages_docs)
+        # only now, so a thread read mid-rewrite can't be cached under the new ETag
+        await db.tasks.update_one({"_id": task_object_id}, {"$inc": {"version": 1}})
+
+        logs.info("task_updated", task_id=task_id, messages=len(messages_docs), mentions=len(mentioned_users))
+        await realtime.publish(task_audience(result), {"type": "task", "task": schemas.get_task(result)})
+        return json_response(schemas.get_task(result))
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error updating task: {type(e).__name__}: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logs.error("task_update_failed", e, task_id=task_id, user=current_user["username"])
         raise HTTPException(status_code=500, detail=str(e))
 
-import requests
-from typing import Dict
-from langchain_openai import ChatOpenAI
-from dotenv import load_dotenv
-import os
 
-load_dotenv()
+# ------------------ TASK MESSAGES ------------------
+# Messages live flat in task_messages. path is the "/"-joined ObjectIds from the
+# root message down, so sorting by path walks a thread depth-first and a path
+# prefix selects a subtree.
+THREAD_PAGE_SIZE = 100
+MAX_THREAD_PAGE_SIZE = 500
+
+def task_access_filter(task_id: str, username: str) -> dict:
+    return {
+        "_id": parse_object_id(task_id, "task"),
+        "$or": [
+            {"owner": username},
+            {"mentioned_users": username}
+        ]
+    }
 
+def task_audience(task, extra=()):
+    """Hub keys of the users that should be pushed changes to this task"""
+    usernames = {task["owner"], *task.get("mentioned_users", []), *extra}
+    return [realtime.name_key(username) for username in usernames]
 
-def ask_llm(prompt: str) -> str:
-    OPEN_ROUTER_KEY = os.getenv("OPENROUTER_API_KEY")
-    llm = ChatOpenAI(
-        model="z-ai/glm-4.5-air:free",
-    # model="openrouter/auto",
-    api_key=OPEN_ROUTER_KEY,
-    base_url="https://openrouter.ai/api/v1",
+async def get_accessible_task(task_id: str, username: str):
+    task = await db["tasks"].find_one(
+        task_access_filter(task_id, username), {"owner": 1, "mentioned_users": 1, "version": 1}
     )
-    response = llm.invoke(prompt)
-    return response.content
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found or you don't have permission")
+    return task
+
+async def get_task_message_doc(task_object_id: ObjectId, message_id: str):
+    msg = await db.task_messages.find_one({"task_id": task_object_id, "id": message_id})
+    if not msg:
+        raise HTTPException(status_code=404, detail="Message not found")
+    return msg
 
-def search_web(query: str) -> List[Dict[str, str]]:
+@app.get("/tasks/{task_id}/thread")
+async def get_task_thread(
+    task_id: str,
+    request: Request,
+    root: str | None = None,
+    after: str | None = None,
+    limit: int = Query(THREAD_PAGE_SIZE, ge=1, le=MAX_THREAD_PAGE_SIZE),
+    current_user=Depends(get_current_user),
+):
     """
-    Search the web using Serper API
-    https://serper.dev/
+    Page through a task's messages in depth-first order. With root, only the
+    replies below that message are returned. Pass next_cursor back as after.
     """
-    
-    SERPER_API_KEY = os.getenv('SERPER_API_KEY')
-    if not SERPER_API_KEY:
-        raise ValueError("SERPER_API_KEY not set")
-
-    url = "https://google.serper.dev/search"
-    headers = {
-        "X-API-KEY": SERPER_API_KEY,
-        "Content-Type": "application/json"
-    }
-    payload = {
-        "q": query,
-        "num": 5
-    }
+    task = await get_accessible_task(task_id, current_user['username'])
+
+    etag = weak_etag("thread", task_id, task.get("version", 0), root, after, limit)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+
+    query = {"task_id": task["_id"]}
+    path_filter = {}
+    if root:
+        root_msg = await get_task_message_doc(task["_id"], root)
+        path_filter["$regex"] = "^" + re.escape(root_msg["path"] + "/")
+    if after:
+        path_filter["$gt"] = after
+    if path_filter:
+        query["path"] = path_filter
+
+    docs = await db.task_messages.find(query).sort("path", 1).limit(limit + 1).to_list(limit + 1)
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+
+    response = json_response({
+        "messages": [schemas.get_task_message(doc) for doc in docs],
+        "next_cursor": docs[-1]["path"] if has_more else None,
+    })
+    set_etag(response, etag)
+    return response
 
+@app.post("/tasks/{task_id}/messages")
+async def add_task_message(task_id: str, message: models.TaskMessageCreate, current_user=Depends(get_current_user)):
+    """Append a top-level message, or a reply to parentId, as a single row"""
+    task = await get_accessible_task(task_id, current_user['username'])
+
+    parent = None
+    if message.parentId:
+        parent = await get_task_message_doc(task["_id"], message.parentId)
+
+    _id = ObjectId()
+    msg = {
+        "_id": _id,
+        "task_id": task["_id"],
+        "id": message.id or str(_id),
+        "text": message.text,
+        "sender": current_user["name"],
+        "sender_username": current_user["username"],
+        "timestamp": datetime.utcnow(),
+        "parentId": message.parentId,
+        "path": f"{parent['path']}/{_id}" if parent else str(_id),
+        "depth": parent["depth"] + 1 if parent else 0,
+        "reply_count": 0,
+    }
     try:
-        response = requests.post(
-            url,
-            json=payload,
-            headers=headers,
-            timeout=10
-        )
-        response.raise_for_status()
-        data = response.json()
+        await db.task_messages.insert_one(msg)
+    except DuplicateKeyError:
+        raise HTTPException(status_code=409, detail="Message id already exists")
+
+    if parent:
+        await db.task_messages.update_one({"_id": parent["_id"]}, {"$inc": {"reply_count": 1}})
+
+    task_update = {"$inc": {"message_count": 1, "version": 1}}
+    mentions = tasks.extract_mentions(message.text)
+    if mentions:
+        task_update["$addToSet"] = {"mentioned_users": {"$each": mentions}}
+        await tasks.record_mentions(db, task["_id"], [msg])
+    await db["tasks"].update_one({"_id": task["_id"]}, task_update)
+
+    await realtime.publish(
+        task_audience(task, mentions),
+        {"type": "task_message", "task_id": task_id, "message": schemas.get_task_message(msg)},
+    )
+    return schemas.get_task_message(msg)
+
+@app.patch("/tasks/{task_id}/messages/{message_id}")
+async def edit_task_message(task_id: str, message_id: str, edit: models.TaskMessageEdit, current_user=Depends(get_current_user)):
+    """Replace the text of one message; only its sender may edit it"""
+    task = await get_accessible_task(task_id, current_user['username'])
+
+    msg = await get_task_message_doc(task["_id"], message_id)
+    # display names aren't unique, so authorship is the stored username; rows from
+    # before it was recorded have none and can't be edited
+    if msg.get("sender_username") != current_user["username"]:
+        raise HTTPException(status_code=403, detail="Only the sender can edit this message")
+
+    await db.task_messages.update_one({"_id": msg["_id"]}, {"$set": {"text": edit.text}})
+
+    dropped = set(tasks.extract_mentions(msg["text"]))
+    msg["text"] = edit.text
+    mentions = tasks.extract_mentions(edit.text)
+    dropped.difference_update(mentions)
+    # mentions dropped by the edit go away; new ones are added
+    await db.mentions.delete_many({
+        "task_id": task["_id"],
+        "message_id": msg["id"],
+        "user": {"$nin": mentions},
+    })
+    # a user mentioned nowhere else in the task loses access along with the list entry
+    await tasks.pull_unmentioned(db, task["_id"], dropped)
+    task_update = {"$inc": {"version": 1}}
+    if mentions:
+        await tasks.record_mentions(db, task["_id"], [msg])
+        task_update["$addToSet"] = {"mentioned_users": {"$each": mentions}}
+    await db["tasks"].update_one({"_id": task["_id"]}, task_update)
+
+    await realtime.publish(
+        task_audience(task, mentions),
+        {"type": "task_message_edited", "task_id": task_id, "message": schemas.get_task_message(msg)},
+    )
+    return schemas.get_task_message(msg)
+
+@app.patch("/tasks/{task_id}/status")
+async def update_task_status(task_id: str, update: models.TaskStatusUpdate, current_user=Depends(get_current_user)):
+    task = await db["tasks"].find_one_and_update(
+        task_access_filter(task_id, current_user['username']),
+        {"$set": {"status": update.status}, "$inc": {"version": 1}},
+        projection={"owner": 1, "mentioned_users": 1},
+    )
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found or you don't have permission")
 
-        results = []
-        for item in data.get("organic", []):
-            results.append({
-                "title": item.get("title", ""),
-                "snippet": item.get("snippet", ""),
-                "url": item.get("link", "")
-            })
+    await realtime.publish(
+        task_audience(task),
+        {"type": "task_status", "task_id": task_id, "status": update.status},
+    )
+    return {"id": task_id, "status": update.status}
 
-        return results
 
-    except requests.exceptions.RequestException as e:
-        raise RuntimeError(f"Serper request failed: {e}")
+# ------------------ MENTIONS ------------------
+# Rows are written by tasks.record_mentions alongside each message.
+@app.get("/mentions")
+async def get_mentions(
+    unread: bool = False,
+    before: str | None = None,
+    limit: int = Query(MESSAGE_PAGE_SIZE, ge=1, le=MAX_MESSAGE_PAGE_SIZE),
+    current_user=Depends(get_current_user),
+):
+    """Newest-first mentions of the current user, paged with the same cursors as messages"""
+    username = current_user["username"]
 
+    query = {"user": username}
+    if unread:
+        query["read"] = False
+    if before:
+        created_at, mention_id = decode_cursor(before)
+        query["$or"] = [
+            {"created_at": {"$lt": created_at}},
+            {"created_at": created_at, "_id": {"$lt": mention_id}},
+        ]
 
-@app.post('/llms')
-async def llm_request(data: models.LLMRequest):
-    
-    print(data)
-    
+    mentions = await db.mentions.find(query).sort(
+        [("created_at", -1), ("_id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    has_more = len(mentions) > limit
+    mentions = mentions[:limit]
+    next_cursor = encode_cursor(mentions[-1]) if has_more else None
+
+    task_titles = {}
+    task_ids = list({m["task_id"] for m in mentions})
+    if task_ids:
+        async for task in db.tasks.find({"_id": {"$in": task_ids}}, {"title": 1}):
+            task_titles[task["_id"]] = task["title"]
+
+    return json_response({
+        "mentions": [
+            schemas.get_mention(m, task_titles.get(m["task_id"], "")) for m in mentions
+        ],
+        "next_cursor": next_cursor,
+        "unread_count": await db.mentions.count_documents({"user": username, "read": False}),
+    })
+
+@app.post("/mentions/read")
+async def mark_mentions_read(request: models.MentionsRead, current_user=Depends(get_current_user)):
+    """Mark the given mentions as read, or all of them when ids is omitted"""
+    query = {"user": current_user["username"], "read": False}
+    if request.ids is not None:
+        query["_id"] = {"$in": [parse_object_id(i, "mention") for i in request.ids]}
+
+    result = await db.mentions.update_many(query, {"$set": {"read": True}})
+    return {"updated": result.modified_count}
+
+
+async def build_llm_prompt(data: models.LLMRequest):
+    """
+    Build the prompt for the last message in the request.
+    Returns (prompt, sources, prefix), or None when web search found nothing.
+    """
     # # getting user message
     last_message = data.messages[-1].message
     # print(last_message)
@@ -518,35 +1273,71 @@ async def llm_request(data: models.LLMRequest):
     
     # Perform web search if enabled
     if data.use_search:
-        print("🔍 Searching the web...")
-        search_results = search_web(last_message)
+        search_results = await assistant.search_web(last_message)
         
         # Add search context to the message
-        if search_results:
-            search_context = "\n\nWeb search results:\n"
-            for i, result in enumerate(search_results, 1):
-                search_context += f"{i}. {result['title']}\n"
-                search_context += f"   {result['snippet']}\n"
-                search_context += f"   Source: {result['url']}\n\n"
-                sources.append(result['url'])
-            
-            # Append search context to the message
-            enhanced_message = f"{search_context}\nPlease answer based on the search results above.\n{last_message}"
-            response = ask_llm(enhanced_message)
-        else:
-            return 'Failed to get search context from web'
-    else:
-        # TEMP response (replace with real LLM later)
-        query = last_message
-        context = data.messages[-1].context
-        if len(context) > 0:
-            query = f"{context}\nPlease answer based on above context.\n Question: {query}"
-        print(query)
-        response = f"Answer:\n {ask_llm(query)}"
+        if not search_results:
+            return None
+
+        search_context = "\n\nWeb search results:\n"
+        for i, result in enumerate(search_results, 1):
+            search_context += f"{i}. {result['title']}\n"
+            search_context += f"   {result['snippet']}\n"
+            search_context += f"   Source: {result['url']}\n\n"
+            sources.append(result['url'])
+        
+        # Append search context to the message
+        enhanced_message = f"{search_context}\nPlease answer based on the search results above.\n{last_message}"
+        return enhanced_message, sources, ""
+
+    query = last_message
+    context = data.messages[-1].context
+    if len(context) > 0:
+        query = f"{context}\nPlease answer based on above context.\n Question: {query}"
+    return query, sources, "Answer:\n "
+
+
+async def stream_llm_response(prompt: str, sources: List[str], prefix: str, use_cache: bool):
+    """NDJSON frames: one per token chunk, then a final frame carrying the sources"""
+    try:
+        if prefix:
+            yield json.dumps({"type": "token", "content": prefix}) + "\n"
+        async for chunk in assistant.stream_llm(prompt, use_cache):
+            yield json.dumps({"type": "token", "content": chunk}) + "\n"
+    except Exception as e:
+        yield json.dumps({"type": "error", "message": str(e)}) + "\n"
+        return
+
+    yield json.dumps({"type": "done", "role": "assistant", "sources": sources}) + "\n"
+
+
+@app.get('/llms/stats')
+async def llm_stats():
+    return assistant.stats()
+
+
+@app.post('/llms')
+async def llm_request(data: models.LLMRequest):
+    logs.info(
+        "llm_request", turns=len(data.messages), use_search=data.use_search,
+        stream=data.stream, use_cache=data.use_cache,
+    )
+
+    built = await build_llm_prompt(data)
+    if built is None:
+        return 'Failed to get search context from web'
+    prompt, sources, prefix = built
+
+    if data.stream:
+        return StreamingResponse(
+            stream_llm_response(prompt, sources, prefix, data.use_cache),
+            media_type="application/x-ndjson",
+        )
+
+    response = prefix + await assistant.ask_llm(prompt, data.use_cache)
 
     return {
         "role": "assistant",
         "message": response,
         "sources": sources
     }
-    
@@ -0,0 +1,181 @@
+"""
+Prometheus metrics: per-route HTTP latency, in-flight requests and payload sizes,
+per-collection Mongo command timings, upstream LLM/search latency and the
+hit/miss counters of the in-process caches.
+
+Scraped from GET /metrics.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Gauge, Histogram, generate_latest
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from pymongo import monitoring
+
+import logs
+
+# requests and Mongo commands slower than this are always logged
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+SLOW_MONGO_MS = float(os.getenv("SLOW_MONGO_MS", "100"))
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HTTP_LATENCY = Histogram(
+    "http_request_duration_seconds", "Time from request start to last response byte",
+    ["method", "route", "status"], buckets=LATENCY_BUCKETS,
+)
+HTTP_IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being handled", ["method"])
+HTTP_REQUEST_SIZE = Histogram(
+    "http_request_size_bytes", "Request body size", ["method", "route"], buckets=SIZE_BUCKETS,
+)
+HTTP_RESPONSE_SIZE = Histogram(
+    "http_response_size_bytes", "Response body size on the wire", ["method", "route"], buckets=SIZE_BUCKETS,
+)
+MONGO_LATENCY = Histogram(
+    "mongo_command_duration_seconds", "Mongo command round trip",
+    ["collection", "command", "outcome"], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_LATENCY = Histogram(
+    "upstream_request_duration_seconds", "LLM and web search calls, excluding local queueing",
+    ["service", "outcome"], buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_ERRORS = Counter("upstream_errors_total", "Failed LLM and web search calls", ["service"])
+
+
+# name -> TTLCache; read at scrape time, so the caches keep their plain int counters
+_caches = {}
+
+
+def register_cache(name: str, cache):
+    _caches[name] = cache
+
+
+class CacheCollector:
+    def collect(self):
+        hits = CounterMetricFamily("cache_hits", "In-process cache hits", labels=["cache"])
+        misses = CounterMetricFamily("cache_misses", "In-process cache misses", labels=["cache"])
+        size = GaugeMetricFamily("cache_entries", "Entries currently held", labels=["cache"])
+        for name, cache in _caches.items():
+            hits.add_metric([name], cache.hits)
+            misses.add_metric([name], cache.misses)
+            size.add_metric([name], len(cache))
+        yield hits
+        yield misses
+        yield size
+
+
+REGISTRY.register(CacheCollector())
+
+
+def render() -> tuple[bytes, str]:
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+def route_label(scope) -> str:
+    # the route template, never the raw path, so ids don't explode the label set
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+class MetricsMiddleware:
+    """Times every HTTP request through the last body chunk, so streamed responses count in full"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        start = time.perf_counter()
+        sizes = {"request": 0, "response": 0}
+        status = 500
+
+        async def counting_receive():
+            message = await receive()
+            if message["type"] == "http.request":
+                sizes["request"] += len(message.get("body", b""))
+            return message
+
+        async def counting_send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                sizes["response"] += len(message.get("body", b""))
+            await send(message)
+
+        HTTP_IN_FLIGHT.labels(method).inc()
+        try:
+            await self.app(scope, counting_receive, counting_send)
+        finally:
+            HTTP_IN_FLIGHT.labels(method).dec()
+            elapsed = time.perf_counter() - start
+            route = route_label(scope)
+            HTTP_LATENCY.labels(method, route, str(status)).observe(elapsed)
+            HTTP_REQUEST_SIZE.labels(method, route).observe(sizes["request"])
+            HTTP_RESPONSE_SIZE.labels(method, route).observe(sizes["response"])
+
+            fields = {
+                "method": method, "route": route, "status": status,
+                "duration_ms": round(elapsed * 1000, 1), "bytes": sizes["response"],
+            }
+            if elapsed * 1000 >= SLOW_REQUEST_MS:
+                logs.warning("slow_request", **fields)
+            else:
+                logs.info("request", **fields)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """
+    pymongo command monitoring. Runs on the driver's threads, so it only touches
+    the metrics and a dict keyed by (connection, request id).
+    """
+
+    IGNORED = {"hello", "ismaster", "isMaster", "ping", "buildInfo", "endSessions", "saslStart", "saslContinue"}
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        if event.command_name in self.IGNORED:
+            return
+        target = event.command.get("collection" if event.command_name == "getMore" else event.command_name)
+        self._collections[(event.connection_id, event.request_id)] = target if isinstance(target, str) else "-"
+
+    def succeeded(self, event):
+        self._record(event, "ok")
+
+    def failed(self, event):
+        self._record(event, "error")
+
+    def _record(self, event, outcome: str):
+        collection = self._collections.pop((event.connection_id, event.request_id), None)
+        if collection is None:
+            return
+        MONGO_LATENCY.labels(collection, event.command_name, outcome).observe(event.duration_micros / 1e6)
+
+        duration_ms = event.duration_micros / 1000
+        if outcome == "error" or duration_ms >= SLOW_MONGO_MS:
+            logs.warning(
+                "slow_mongo_command" if outcome == "ok" else "mongo_command_failed",
+                collection=collection, command=event.command_name, duration_ms=round(duration_ms, 1),
+            )
+
+
+@contextmanager
+def track_upstream(service: str):
+    start = time.perf_counter()
+    outcome = "ok"
+    try:
+        yield
+    except BaseException:
+        outcome = "error"
+        UPSTREAM_ERRORS.labels(service).inc()
+        raise
+    finally:
+        UPSTREAM_LATENCY.labels(service, outcome).observe(time.perf_counter() - start)
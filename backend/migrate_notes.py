@@ -0,0 +1,55 @@
+"""
+Move notes embedded in projects documents into the notes collection.
+
+Safe to re-run: notes keep their original _id and are upserted, and the
+embedded array is only removed once every note of that project is copied.
+
+    python migrate_notes.py
+"""
+import asyncio
+from bson import ObjectId
+from pymongo import ReplaceOne
+
+import database, indexes
+
+
+async def migrate_notes(db=None):
+    db = db if db is not None else database.get_db()
+    await indexes.ensure_indexes(db)
+
+    migrated_projects = 0
+    migrated_notes = 0
+    async for project in db.projects.find({"notes.0": {"$exists": True}}, {"notes": 1}):
+        operations = []
+        for note in project["notes"]:
+            note_id = note.get("_id") or ObjectId()
+            operations.append(ReplaceOne(
+                {"_id": note_id},
+                {
+                    "_id": note_id,
+                    "project_id": project["_id"],
+                    "title": note["title"],
+                    "body": note["body"],
+                    "createdAt": note["createdAt"],
+                },
+                upsert=True,
+            ))
+
+        await db.notes.bulk_write(operations, ordered=False)
+        await db.projects.update_one({"_id": project["_id"]}, {"$unset": {"notes": ""}})
+        migrated_projects += 1
+        migrated_notes += len(operations)
+
+    # empty embedded arrays carry nothing to move
+    await db.projects.update_many({"notes": {"$size": 0}}, {"$unset": {"notes": ""}})
+
+    return migrated_projects, migrated_notes
+
+
+async def main():
+    projects, notes = await migrate_notes()
+    print(f"Migrated {notes} notes from {projects} projects")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
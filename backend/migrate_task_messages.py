@@ -0,0 +1,66 @@
+"""
+Move the nested messages tree embedded in tasks documents into the flat
+task_messages collection, and record message_count on each task. Then
+backfill the mentions collection from every stored message.
+
+Safe to re-run: a task's rows are replaced before its embedded array is
+removed, so an interrupted run simply redoes that task.
+
+    python migrate_task_messages.py
+"""
+import asyncio
+
+import database, indexes, models
+from tasks import flatten_messages, record_mentions
+
+
+async def migrate_task_messages(db=None):
+    db = db if db is not None else database.get_db()
+    await indexes.ensure_indexes(db)
+
+    migrated_tasks = 0
+    migrated_messages = 0
+    async for task in db.tasks.find({"messages": {"$exists": True}}, {"messages": 1}):
+        messages = [models.TaskMessage.model_validate(msg) for msg in task["messages"]]
+        # legacy trees may repeat a client id; those copies get fresh ids so the
+        # unique (task_id, id) index can't fail after the old rows are deleted
+        docs, mentioned = flatten_messages(task["_id"], messages, rename_duplicates=True)
+
+        await db.task_messages.delete_many({"task_id": task["_id"]})
+        if docs:
+            await db.task_messages.insert_many(docs)
+
+        update = {"$set": {"message_count": len(docs)}, "$unset": {"messages": ""}}
+        if mentioned:
+            update["$addToSet"] = {"mentioned_users": {"$each": list(mentioned)}}
+        await db.tasks.update_one({"_id": task["_id"]}, update)
+
+        migrated_tasks += 1
+        migrated_messages += len(docs)
+
+    return migrated_tasks, migrated_messages
+
+
+async def backfill_mentions(db=None):
+    """Upsert a mentions row for every @username in task_messages; rows keep their read state"""
+    db = db if db is not None else database.get_db()
+    batch, task_id = [], None
+    async for msg in db.task_messages.find({"text": {"$regex": r"@\w"}}).sort("task_id", 1):
+        if msg["task_id"] != task_id and batch:
+            await record_mentions(db, task_id, batch)
+            batch = []
+        task_id = msg["task_id"]
+        batch.append(msg)
+    if batch:
+        await record_mentions(db, task_id, batch)
+
+
+async def main():
+    tasks, messages = await migrate_task_messages()
+    print(f"Migrated {messages} messages from {tasks} tasks")
+    await backfill_mentions()
+    print("Mentions backfilled")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
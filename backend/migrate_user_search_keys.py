@@ -0,0 +1,45 @@
+"""
+Backfill search_keys on users registered before directory search existed.
+
+Safe to re-run: keys are recomputed from name, username and email and overwritten.
+
+    python migrate_user_search_keys.py
+"""
+import asyncio
+from pymongo import UpdateOne
+
+import database, indexes, jwt_token, search
+
+BATCH_SIZE = 1000
+
+
+async def migrate_user_search_keys(db=None):
+    db = db if db is not None else database.get_db()
+    await indexes.ensure_indexes(db)
+
+    updated = 0
+    operations = []
+    async for user in db.users.find({}, {"name": 1, "username": 1, "email": 1}):
+        keys = search.user_search_keys(user.get("name", ""), user["username"], user["email"])
+        operations.append(UpdateOne({"_id": user["_id"]}, {"$set": {"search_keys": keys}}))
+        # cached auth lookups would otherwise serve the pre-backfill document until the TTL runs out
+        jwt_token.invalidate_user(user["email"])
+        if len(operations) == BATCH_SIZE:
+            await db.users.bulk_write(operations, ordered=False)
+            updated += len(operations)
+            operations = []
+
+    if operations:
+        await db.users.bulk_write(operations, ordered=False)
+        updated += len(operations)
+
+    return updated
+
+
+async def main():
+    users = await migrate_user_search_keys()
+    print(f"Backfilled search keys for {users} users")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import List, Literal, Optional
 from datetime import datetime
 
 class UserCreate(BaseModel):
@@ -21,6 +21,26 @@ class Note(BaseModel):
     body: str
     createdAt: datetime
 
+class NoteOperation(BaseModel):
+    op: Literal["create", "update", "delete"]
+    id: Optional[str] = None  # note id, for update and delete
+    title: Optional[str] = None
+    body: Optional[str] = None
+
+    @model_validator(mode="after")
+    def check_fields(self):
+        if self.op == "create" and (self.title is None or self.body is None):
+            raise ValueError("create needs title and body")
+        if self.op != "create" and not self.id:
+            raise ValueError(f"{self.op} needs the note id")
+        if self.op == "update" and self.title is None and self.body is None:
+            raise ValueError("update needs title or body")
+        return self
+
+class NoteBatch(BaseModel):
+    operations: List[NoteOperation] = Field(min_length=1, max_length=500)
+    ordered: bool = True  # stop at the first failed operation
+
 class ProjectCreate(BaseModel):
     title: str
     description: str
@@ -36,6 +56,9 @@ class Project(BaseModel):
 
 class AddMember(BaseModel):
     email: str
+
+class BulkInvite(BaseModel):
+    emails: List[str] = Field(min_length=1, max_length=200)
     
 
 class Message(BaseModel):
@@ -76,9 +99,9 @@ class Task(BaseModel):
     id: str
     title: str
     status: str = "pending"
-    messages: List[TaskMessage] = []
     created_at: datetime
     mentioned_users: List[str] = []
+    message_count: int = 0
     
 class TaskCreate(BaseModel):
     title: str
@@ -90,6 +113,20 @@ class TaskUpdate(BaseModel):
     status: str
     messages: List[TaskMessage]
 
+class TaskMessageCreate(BaseModel):
+    text: str
+    parentId: Optional[str] = None
+    id: Optional[str] = None  # client-generated id, kept so optimistic UI state lines up
+
+class TaskMessageEdit(BaseModel):
+    text: str
+
+class TaskStatusUpdate(BaseModel):
+    status: str
+
+class MentionsRead(BaseModel):
+    ids: Optional[List[str]] = None
+
 
 class LLMMessage(BaseModel):
     role: str
@@ -99,6 +136,8 @@ class LLMMessage(BaseModel):
 class LLMRequest(BaseModel):
     messages: List[LLMMessage]
     use_search: bool = False
+    stream: bool = False
+    use_cache: bool = True
 
 class Source(BaseModel):
     title: str
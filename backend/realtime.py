@@ -0,0 +1,137 @@
+"""
+Push channel for the /ws endpoint.
+
+The Hub tracks open WebSocket connections per user key: user_key(id) for direct
+messages, which address user ids, and name_key(username) for tasks, which address
+usernames. The prefixes keep the two apart, so a username that looks like
+someone's id can't receive their messages. Route handlers call
+publish(); the configured Broker carries the event to every worker's hub.
+InProcessBroker is enough for a single uvicorn worker. For several workers,
+plug in a Broker that fans events out over shared infrastructure and calls
+hub.deliver() for each event it receives.
+"""
+import asyncio
+import os
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, Set
+
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.encoders import jsonable_encoder
+
+# events buffered per connection before it is treated as a slow consumer and closed
+SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "100"))
+
+
+def user_key(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def name_key(username: str) -> str:
+    return f"name:{username}"
+
+
+class Connection:
+    def __init__(self, websocket: WebSocket):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SEND_QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, event: dict):
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # the client has missed events; closing makes it reconnect and refetch
+            self.overflowed = True
+
+    async def send_loop(self):
+        while True:
+            event = await self.queue.get()
+            if self.overflowed:
+                await self.websocket.close(code=1013)
+                return
+            await self.websocket.send_json(event)
+
+
+class Hub:
+    def __init__(self):
+        self.connections: Dict[str, Set[Connection]] = {}
+
+    def deliver(self, keys: Iterable[str], event: dict):
+        """Queue event on every local connection registered under any of keys"""
+        targets = set()
+        for key in keys:
+            targets.update(self.connections.get(key, ()))
+        for connection in targets:
+            connection.offer(event)
+
+    async def serve(self, websocket: WebSocket, keys: Iterable[str]):
+        keys = list(keys)
+        connection = Connection(websocket)
+        for key in keys:
+            self.connections.setdefault(key, set()).add(connection)
+
+        sender = asyncio.create_task(connection.send_loop())
+        # clients only listen; reading detects the disconnect
+        receiver = asyncio.create_task(self._drain(websocket))
+        try:
+            await asyncio.wait({sender, receiver}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            sender.cancel()
+            receiver.cancel()
+            # a send to a peer that went away fails the sender; collecting it here
+            # keeps that out of the "Task exception was never retrieved" log
+            await asyncio.gather(sender, receiver, return_exceptions=True)
+            for key in keys:
+                group = self.connections.get(key)
+                if group is not None:
+                    group.discard(connection)
+                    if not group:
+                        del self.connections[key]
+
+    async def _drain(self, websocket: WebSocket):
+        try:
+            while True:
+                await websocket.receive_text()
+        except WebSocketDisconnect:
+            pass
+
+
+class Broker(ABC):
+    """Carries published events to the hub of every worker"""
+
+    async def start(self, hub: Hub):
+        pass
+
+    async def stop(self):
+        pass
+
+    @abstractmethod
+    async def publish(self, keys: Iterable[str], event: dict):
+        ...
+
+
+class InProcessBroker(Broker):
+    async def start(self, hub: Hub):
+        self.hub = hub
+
+    async def publish(self, keys: Iterable[str], event: dict):
+        self.hub.deliver(keys, event)
+
+
+hub = Hub()
+broker: Broker = InProcessBroker()
+
+
+async def startup():
+    await broker.start(hub)
+
+
+async def shutdown():
+    await broker.stop()
+
+
+async def publish(keys: Iterable[str], event: dict):
+    """Push event to every connection registered under keys (see user_key and name_key)"""
+    await broker.publish(list(keys), jsonable_encoder(event))
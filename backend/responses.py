@@ -0,0 +1,59 @@
+"""
+Response layer: orjson rendering and size-gated compression.
+
+json_response() wraps schema output that is already JSON-shaped. Returning it
+from a route skips FastAPI's jsonable_encoder pass and any response_model
+re-validation, so only use it for dicts built by schemas.py.
+"""
+import os
+
+import orjson
+from bson import ObjectId
+from brotli_asgi import BrotliMiddleware
+from fastapi.responses import ORJSONResponse
+
+# responses smaller than this are sent uncompressed
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+COMPRESSION_QUALITY = int(os.getenv("COMPRESSION_QUALITY", "4"))
+
+
+def _default(value):
+    if isinstance(value, ObjectId):
+        return str(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+def dumps(content) -> bytes:
+    return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+class FastJSONResponse(ORJSONResponse):
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def json_response(content, status_code: int = 200, headers: dict | None = None) -> FastJSONResponse:
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
+
+
+class CompressionMiddleware:
+    """
+    Brotli for clients that accept it, gzip otherwise, above COMPRESSION_MIN_SIZE.
+    Streaming routes are passed through so tokens are not held back in the compressor.
+    """
+
+    def __init__(self, app, exclude_paths=()):
+        self.app = app
+        self.exclude_paths = set(exclude_paths)
+        self.compressed = BrotliMiddleware(
+            app,
+            quality=COMPRESSION_QUALITY,
+            minimum_size=COMPRESSION_MIN_SIZE,
+            gzip_fallback=True,
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"] not in self.exclude_paths:
+            await self.compressed(scope, receive, send)
+        else:
+            await self.app(scope, receive, send)
@@ -6,28 +6,47 @@ def get_user(user) -> dict:
         "email": user["email"]
     }
 
-def parse_message(msg_dict):
-    """Recursively parse message with nested replies"""
+def get_note(note) -> dict:
     return {
-        "id": msg_dict.get("id"),
-        "text": msg_dict.get("text"),
-        "sender": msg_dict.get("sender"),
-        "timestamp": msg_dict.get("timestamp"),
-        "parentId": msg_dict.get("parentId"),
-        "replies": [parse_message(reply) for reply in msg_dict.get("replies", [])]
+        "id": str(note["_id"]),
+        "title": note["title"],
+        "body": note["body"],
+        "createdAt": note["createdAt"],
+    }
+
+def get_task_message(msg) -> dict:
+    """Flat task message; the thread is rebuilt from parentId on the client"""
+    return {
+        "id": msg["id"],
+        "text": msg["text"],
+        "sender": msg["sender"],
+        "sender_username": msg.get("sender_username"),
+        "timestamp": msg["timestamp"],
+        "parentId": msg.get("parentId"),
+        "depth": msg.get("depth", 0),
+        "reply_count": msg.get("reply_count", 0),
+    }
+
+def get_mention(mention, task_title: str = "") -> dict:
+    return {
+        "id": str(mention["_id"]),
+        "task_id": str(mention["task_id"]),
+        "task_title": task_title,
+        "message_id": mention["message_id"],
+        "sender": mention["sender"],
+        "excerpt": mention.get("excerpt", ""),
+        "created_at": mention["created_at"],
+        "read": mention.get("read", False),
     }
 
 def get_task(task) -> dict:
-    # Parse messages with nested structure
-    messages = [parse_message(msg) for msg in task.get("messages", [])]
-    
     return {
         "id": str(task["_id"]),
         "title": task["title"],
         "status": task["status"],
-        "messages": messages,
         "created_at": task["created_at"],
-        "mentioned_users": task.get("mentioned_users", [])
+        "mentioned_users": task.get("mentioned_users", []),
+        "message_count": task.get("message_count", 0),
     }
 
     
@@ -39,12 +58,16 @@ def get_project(project):
         "createdBy": project['createdBy'],
         "createdAt": project["createdAt"],
         "members": project["members"],
-        "notes": [
-            {
-                "title": note["title"],
-                "body": note["body"],
-                "createdAt": note["createdAt"],
-            }
-            for note in project.get("notes", [])
-        ],
-    }
\ No newline at end of file
+        "note_count": project.get("note_count", 0),
+    }
+
+def get_project_summary(project):
+    return {
+        "id": str(project["_id"]),
+        "title": project["title"],
+        "description": project["description"],
+        "createdBy": project['createdBy'],
+        "createdAt": project["createdAt"],
+        "member_count": project.get("member_count", 0),
+        "note_count": project.get("note_count", 0),
+    }
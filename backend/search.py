@@ -0,0 +1,55 @@
+import re
+from typing import List
+
+SNIPPET_LENGTH = 160
+
+
+def query_terms(query: str) -> List[str]:
+    return [term.lower() for term in re.findall(r"\w+", query)]
+
+
+def highlight_pattern(terms: List[str]):
+    # Mongo stems words for text search, so highlight any word starting with a term
+    if not terms:
+        return None
+    return re.compile(r"\b(?:" + "|".join(re.escape(t) for t in terms) + r")\w*", re.IGNORECASE)
+
+
+def make_snippet(text: str, pattern) -> dict | None:
+    """
+    Window of SNIPPET_LENGTH characters around the first match in text, with
+    [start, end] offsets of every match inside the window. None if nothing matches.
+    """
+    if not text or pattern is None:
+        return None
+
+    first = pattern.search(text)
+    if first is None:
+        return None
+
+    start = max(0, first.start() - SNIPPET_LENGTH // 4)
+    end = min(len(text), start + SNIPPET_LENGTH)
+    window = text[start:end]
+
+    return {
+        "snippet": ("…" if start > 0 else "") + window + ("…" if end < len(text) else ""),
+        "highlights": [
+            [m.start() + (1 if start > 0 else 0), m.end() + (1 if start > 0 else 0)]
+            for m in pattern.finditer(window)
+        ],
+    }
+
+
+def user_search_keys(name: str, username: str, email: str) -> List[str]:
+    """Lowercased strings a directory prefix can match: username, email, full name and each name word"""
+    keys = {username.lower(), email.lower(), name.lower(), *name.lower().split()}
+    return sorted(key for key in keys if key)
+
+
+def normalize_prefix(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def prefix_regex(prefix: str) -> str:
+    # anchored and case-sensitive on lowercased keys, so Mongo turns it into index bounds
+    return "^" + re.escape(prefix)
@@ -0,0 +1,117 @@
+"""
+Task thread helpers shared by the API and the migration scripts.
+
+Threads are stored flat in task_messages with a materialized path. Mentions get
+one row per (mentioned user, task, message), written alongside the message so
+the inbox and the task list never have to scan message text.
+"""
+import re
+
+from bson import ObjectId
+from pymongo import DeleteMany, UpdateOne
+
+MENTION_EXCERPT_LENGTH = 140
+
+
+def extract_mentions(text: str):
+    """Return list of usernames mentioned in text."""
+    return re.findall(r"@(\w+)", text)
+
+
+def flatten_messages(task_object_id: ObjectId, messages, sender_usernames=None, new_sender=None,
+                     rename_duplicates=False):
+    """
+    Turn a TaskMessage tree into task_messages documents with parentId, a
+    materialized path of ObjectIds and depth. Iterative, so deep threads
+    cannot hit the recursion limit. Returns (documents, mentioned usernames).
+
+    sender_usernames maps already stored message ids to their author's username;
+    other messages are attributed to new_sender. `sender` is only a display name.
+
+    Message ids must be unique within the task: a repeated id raises ValueError,
+    or gets a fresh id with rename_duplicates (for migrating legacy data).
+    """
+    sender_usernames = sender_usernames or {}
+    docs = []
+    mentioned = set()
+    seen_ids = set()
+    stack = [(msg, None) for msg in reversed(messages)]
+    while stack:
+        msg, parent = stack.pop()
+        _id = ObjectId()
+        message_id = msg.id
+        if message_id in seen_ids:
+            if not rename_duplicates:
+                raise ValueError(f"Duplicate message id: {message_id}")
+            message_id = str(_id)
+        seen_ids.add(message_id)
+        doc = {
+            "_id": _id,
+            "task_id": task_object_id,
+            "id": message_id,
+            "text": msg.text,
+            "sender": msg.sender,
+            "sender_username": sender_usernames.get(message_id, new_sender),
+            "timestamp": msg.timestamp,
+            "parentId": parent["id"] if parent else None,
+            "path": f"{parent['path']}/{_id}" if parent else str(_id),
+            "depth": parent["depth"] + 1 if parent else 0,
+            "reply_count": len(msg.replies),
+        }
+        docs.append(doc)
+        mentioned.update(extract_mentions(msg.text))
+        stack.extend((reply, doc) for reply in reversed(msg.replies))
+    return docs, mentioned
+
+
+async def record_mentions(db, task_object_id: ObjectId, messages_docs):
+    """Upsert a mentions row per (mentioned user, message); existing rows keep their read state"""
+    operations = []
+    for msg in messages_docs:
+        for username in set(extract_mentions(msg["text"])):
+            operations.append(UpdateOne(
+                {"user": username, "task_id": task_object_id, "message_id": msg["id"]},
+                {
+                    "$set": {"excerpt": msg["text"][:MENTION_EXCERPT_LENGTH]},
+                    "$setOnInsert": {
+                        "sender": msg["sender"],
+                        "created_at": msg["timestamp"],
+                        "read": False,
+                    },
+                },
+                upsert=True,
+            ))
+    if operations:
+        await db.mentions.bulk_write(operations, ordered=False)
+
+
+async def prune_mentions(db, task_object_id: ObjectId, messages_docs):
+    """
+    After a whole thread is replaced, drop mention rows for messages that are gone
+    and for users a kept message no longer mentions. Rows that stay keep their read state.
+    """
+    operations = [DeleteMany({
+        "task_id": task_object_id,
+        "message_id": {"$nin": [msg["id"] for msg in messages_docs]},
+    })]
+    for msg in messages_docs:
+        operations.append(DeleteMany({
+            "task_id": task_object_id,
+            "message_id": msg["id"],
+            "user": {"$nin": extract_mentions(msg["text"])},
+        }))
+    await db.mentions.bulk_write(operations, ordered=False)
+
+
+async def pull_unmentioned(db, task_object_id: ObjectId, usernames):
+    """
+    Remove usernames from the task's mentioned_users once no mention row of theirs
+    remains, so task access (mentioned_users) matches the task list (mentions rows).
+    """
+    usernames = set(usernames)
+    if not usernames:
+        return
+    remaining = await db.mentions.distinct("user", {"task_id": task_object_id, "user": {"$in": list(usernames)}})
+    gone = usernames - set(remaining)
+    if gone:
+        await db.tasks.update_one({"_id": task_object_id}, {"$pull": {"mentioned_users": {"$in": list(gone)}}})
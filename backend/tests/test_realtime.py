@@ -0,0 +1,170 @@
+import asyncio
+import gc
+
+from fastapi import WebSocketDisconnect
+
+import realtime
+
+
+class FakeWebSocket:
+    """Local stand-in for a client socket: records sends and closes, disconnects on demand"""
+
+    def __init__(self):
+        self.sent = []
+        self.closed_with = None
+        self.disconnected = asyncio.Event()
+
+    async def send_json(self, event):
+        self.sent.append(event)
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+
+    async def receive_text(self):
+        await self.disconnected.wait()
+        raise WebSocketDisconnect()
+
+
+async def settle():
+    # let serve() register and the send loops pick up queued events
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_deliver_reaches_every_connection_under_a_key():
+    async def run():
+        hub = realtime.Hub()
+        alice_tab, alice_phone, bob = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+        servers = [
+            asyncio.create_task(hub.serve(alice_tab, [realtime.user_key("a"), realtime.name_key("alice")])),
+            asyncio.create_task(hub.serve(alice_phone, [realtime.user_key("a")])),
+            asyncio.create_task(hub.serve(bob, [realtime.user_key("b")])),
+        ]
+        await settle()
+
+        # listed under two of alice_tab's keys, still delivered once
+        hub.deliver([realtime.user_key("a"), realtime.name_key("alice")], {"type": "message"})
+        await settle()
+
+        for socket in (alice_tab, alice_phone, bob):
+            socket.disconnected.set()
+        await asyncio.gather(*servers)
+        return alice_tab, alice_phone, bob
+
+    alice_tab, alice_phone, bob = asyncio.run(run())
+
+    assert alice_tab.sent == [{"type": "message"}]
+    assert alice_phone.sent == [{"type": "message"}]
+    assert bob.sent == []
+
+
+def test_user_id_key_does_not_match_username_key():
+    async def run():
+        hub = realtime.Hub()
+        victim, impostor = FakeWebSocket(), FakeWebSocket()
+        user_id = "65f000000000000000000001"
+        servers = [
+            asyncio.create_task(hub.serve(victim, [realtime.user_key(user_id)])),
+            # registered with the victim's id as a username
+            asyncio.create_task(hub.serve(impostor, [realtime.name_key(user_id)])),
+        ]
+        await settle()
+        hub.deliver([realtime.user_key(user_id)], {"type": "message"})
+        await settle()
+        victim.disconnected.set()
+        impostor.disconnected.set()
+        await asyncio.gather(*servers)
+        return victim, impostor
+
+    victim, impostor = asyncio.run(run())
+
+    assert victim.sent == [{"type": "message"}]
+    assert impostor.sent == []
+
+
+def test_queue_overflow_closes_connection_with_1013(monkeypatch):
+    monkeypatch.setattr(realtime, "SEND_QUEUE_SIZE", 2)
+
+    async def run():
+        hub = realtime.Hub()
+        socket = FakeWebSocket()
+        server = asyncio.create_task(hub.serve(socket, [realtime.user_key("a")]))
+        await settle()
+
+        # more events than the queue holds before the send loop gets to run
+        for i in range(4):
+            hub.deliver([realtime.user_key("a")], {"n": i})
+        await asyncio.wait_for(server, timeout=1)
+        return hub, socket
+
+    hub, socket = asyncio.run(run())
+
+    assert socket.closed_with == 1013
+    assert socket.sent == []
+    assert hub.connections == {}
+
+
+def test_disconnect_removes_connection():
+    async def run():
+        hub = realtime.Hub()
+        socket = FakeWebSocket()
+        server = asyncio.create_task(hub.serve(socket, [realtime.user_key("a"), realtime.name_key("alice")]))
+        await settle()
+        registered = {key: len(group) for key, group in hub.connections.items()}
+
+        socket.disconnected.set()
+        await asyncio.wait_for(server, timeout=1)
+        return hub, registered
+
+    hub, registered = asyncio.run(run())
+
+    assert registered == {"user:a": 1, "name:alice": 1}
+    assert hub.connections == {}
+
+
+class BrokenPipeWebSocket(FakeWebSocket):
+    """A peer that disconnects while an event is being sent"""
+
+    async def send_json(self, event):
+        raise RuntimeError("Cannot call send once a close message has been sent")
+
+
+def test_failed_send_ends_serve_and_unregisters():
+    unhandled = []
+
+    async def run():
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+        hub = realtime.Hub()
+        socket = BrokenPipeWebSocket()
+        server = asyncio.create_task(hub.serve(socket, [realtime.user_key("a")]))
+        await settle()
+
+        hub.deliver([realtime.user_key("a")], {"type": "message"})
+        await asyncio.wait_for(server, timeout=1)
+        del server
+        gc.collect()
+        return hub
+
+    hub = asyncio.run(run())
+
+    assert unhandled == []
+    assert hub.connections == {}
+
+
+def test_cancelled_serve_stops_its_send_and_receive_tasks():
+    async def run():
+        hub = realtime.Hub()
+        socket = FakeWebSocket()
+        server = asyncio.create_task(hub.serve(socket, [realtime.user_key("a")]))
+        await settle()
+        before = asyncio.all_tasks()
+
+        server.cancel()
+        await asyncio.gather(server, return_exceptions=True)
+        leftover = {task for task in before if not task.done()} - {asyncio.current_task()}
+        return hub, leftover
+
+    hub, leftover = asyncio.run(run())
+
+    assert leftover == set()
+    assert hub.connections == {}
@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+import assistant
+
+
+class FakeSerper:
+    """Stands in for fetch_search_results; records every upstream call"""
+
+    def __init__(self, delay: float = 0, error: Exception | None = None):
+        self.delay = delay
+        self.error = error
+        self.calls = []
+
+    async def __call__(self, query: str):
+        self.calls.append(query)
+        await asyncio.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return [{"title": f"About {query}", "snippet": "", "url": "https://example.com"}]
+
+
+@pytest.fixture(autouse=True)
+def empty_search_cache(monkeypatch):
+    assistant.search_cache.clear()
+    assistant._search_inflight.clear()
+    monkeypatch.setattr(assistant, "search_coalesced", 0)
+    yield
+    assistant.search_cache.clear()
+
+
+def test_repeated_normalized_query_hits_cache(monkeypatch):
+    serper = FakeSerper()
+    monkeypatch.setattr(assistant, "fetch_search_results", serper)
+    hits = assistant.search_cache.hits
+
+    async def run():
+        first = await assistant.search_web("Coffee  Beans")
+        second = await assistant.search_web("  coffee beans ")
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert serper.calls == ["Coffee  Beans"]
+    assert second == first
+    assert assistant.search_cache.hits == hits + 1
+
+
+def test_concurrent_identical_queries_make_one_upstream_call(monkeypatch):
+    serper = FakeSerper(delay=0.05)
+    monkeypatch.setattr(assistant, "fetch_search_results", serper)
+
+    async def run():
+        return await asyncio.gather(*(assistant.search_web("coffee") for _ in range(10)))
+
+    results = asyncio.run(run())
+
+    assert len(serper.calls) == 1
+    assert all(result == results[0] for result in results)
+    assert assistant.search_coalesced == 9
+    assert assistant._search_inflight == {}
+
+
+def test_upstream_error_is_not_cached(monkeypatch):
+    serper = FakeSerper(error=RuntimeError("Serper request failed: 503"))
+    monkeypatch.setattr(assistant, "fetch_search_results", serper)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(assistant.search_web("coffee"))
+
+    assert len(assistant.search_cache) == 0
+    assert assistant._search_inflight == {}
+
+    serper.error = None
+    results = asyncio.run(assistant.search_web("coffee"))
+
+    assert len(serper.calls) == 2
+    assert results[0]["title"] == "About coffee"
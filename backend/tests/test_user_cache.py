@@ -0,0 +1,51 @@
+import asyncio
+
+import pytest
+
+import database
+import jwt_token
+
+
+class FakeUsers:
+    """Stands in for the users collection; counts lookups and serves the current document"""
+
+    def __init__(self, user: dict):
+        self.user = user
+        self.lookups = 0
+
+    async def find_one(self, query):
+        self.lookups += 1
+        return dict(self.user) if query.get("email") == self.user["email"] else None
+
+
+@pytest.fixture
+def users(monkeypatch):
+    collection = FakeUsers({"_id": 1, "email": "ada@example.com", "username": "ada", "name": "Ada"})
+    monkeypatch.setattr(database, "get_db", lambda: {"users": collection})
+    jwt_token.user_cache.clear()
+    yield collection
+    jwt_token.user_cache.clear()
+
+
+def verify(email: str):
+    token = jwt_token.create_access_token({"sub": email})
+    return asyncio.run(jwt_token.verify_token(token, RuntimeError("credentials")))
+
+
+def test_cached_user_skips_lookup(users):
+    verify("ada@example.com")
+    verify("ada@example.com")
+
+    assert users.lookups == 1
+
+
+def test_invalidated_user_is_refetched(users):
+    assert verify("ada@example.com")["name"] == "Ada"
+
+    users.user["name"] = "Ada Lovelace"
+    assert verify("ada@example.com")["name"] == "Ada"
+
+    jwt_token.invalidate_user("ada@example.com")
+
+    assert verify("ada@example.com")["name"] == "Ada Lovelace"
+    assert users.lookups == 2
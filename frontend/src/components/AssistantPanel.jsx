@@ -92,34 +92,67 @@ function AssistantPanel({ onClose }) {
     }
 
     try {
-      const res = await api.post("/llms", {
-        messages: updatedHistory,
-        use_search: isSearchEnabled,
+      const res = await fetch(`${api.defaults.baseURL}/llms`, {
+        method: "POST",
+        headers: {
+          "Content-Type": "application/json",
+          Authorization: `Bearer ${localStorage.getItem("token")}`,
+        },
+        body: JSON.stringify({
+          messages: updatedHistory,
+          use_search: isSearchEnabled,
+          stream: true,
+        }),
       });
+      if (!res.ok || !res.body) throw new Error(`HTTP ${res.status}`);
 
-      // Remove searching indicator
-      if (isSearchEnabled) {
-        setChatHistory((prev) => prev.filter((msg) => msg.role !== "system"));
-      }
-
+      // Remove searching indicator and start an empty reply to stream into
       setChatHistory((prev) => [
-        ...prev,
-        {
-          role: "assistant",
-          message: res.data.message,
-          sources: res.data.sources,
-        },
+        ...prev.filter((msg) => msg.role !== "system"),
+        { role: "assistant", message: "", sources: [] },
       ]);
 
-      setIsLoading(false);
+      const updateReply = (update) =>
+        setChatHistory((prev) => {
+          const last = prev[prev.length - 1];
+          return [...prev.slice(0, -1), { ...last, ...update(last) }];
+        });
+
+      // NDJSON: one {type: "token"} frame per chunk, then {type: "done", sources}
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+        const lines = buffer.split("\n");
+        buffer = lines.pop();
+
+        for (const line of lines) {
+          if (!line.trim()) continue;
+          const frame = JSON.parse(line);
+          if (typeof frame === "string") {
+            updateReply(() => ({ message: frame }));
+          } else if (frame.type === "token") {
+            updateReply((last) => ({ message: last.message + frame.content }));
+          } else if (frame.type === "done") {
+            updateReply(() => ({ sources: frame.sources }));
+          } else if (frame.type === "error") {
+            throw new Error(frame.message);
+          }
+        }
+      }
     } catch (err) {
       setChatHistory((prev) => [
-        ...prev,
+        ...prev.filter((msg) => msg.role !== "system"),
         {
           role: "assistant",
           message: "Failed to get response. Please try again.",
         },
       ]);
+    } finally {
+      setIsLoading(false);
     }
   };
 
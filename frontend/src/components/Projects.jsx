@@ -14,7 +14,7 @@ function Projects() {
   const fetchProjects = async () => {
     setLoading(true);
     try {
-      const res = await api.get("/projects/");
+      const res = await api.get("/projects", { params: { summary: true } });
       setProjects(res.data);
       setError("");
     } catch (err) {
@@ -99,7 +99,7 @@ function Projects() {
   }`}
 >
 
-                  <span>📝 {project.notes.length} notes</span>
+                  <span>📝 {project.note_count} notes</span>
                   <span>{project.createdAt}</span>
                 </div>
               </div>
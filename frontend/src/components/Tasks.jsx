@@ -12,6 +12,7 @@ import {
   Clock,
 } from "lucide-react";
 import api from "../api";
+import { subscribe } from "../realtime";
 import { useTheme } from "../contexts/ThemeContext";
 import { useSelectedTasks } from "../contexts/SelectedTasksContext";
 
@@ -72,39 +73,116 @@ export default function CollaborativeTaskManager() {
     loadTasks();
   }, []);
 
-  /* Create Task in DB*/
-  const createTaskInDB = async (task) => {
-    const res = await api.post("/tasks", task);
-    return res.data;
-  };
+  /* task changes are pushed over the WebSocket instead of reloading /tasks */
+  useEffect(() => {
+    const containsMessage = (messages, id) =>
+      messages.some(
+        (m) => m.id === id || containsMessage(m.replies || [], id)
+      );
+
+    const editMessage = (messages, edited) =>
+      messages.map((m) =>
+        m.id === edited.id
+          ? { ...m, text: edited.text }
+          : { ...m, replies: editMessage(m.replies || [], edited) }
+      );
 
-  /* update task in db*/
-  const updateTaskInDB = async (task) => {
-    const convertMessageFormat = (msg) => ({
-      id: msg.id,
-      text: msg.text,
-      sender: msg.sender,
-      timestamp: msg.timestamp,
-      parentId: msg.parentId,
-      replies: (msg.replies || []).map(convertMessageFormat),
+    return subscribe((event) => {
+      if (event.type === "reconnected") {
+        api.get("/tasks").then((res) => setTasks(res.data));
+      } else if (event.type === "task") {
+        setTasks((prev) =>
+          prev.some((t) => t.id === event.task.id)
+            ? prev.map((t) => (t.id === event.task.id ? { ...t, ...event.task } : t))
+            : [event.task, ...prev]
+        );
+      } else if (event.type === "task_status") {
+        setTasks((prev) =>
+          prev.map((t) =>
+            t.id === event.task_id ? { ...t, status: event.status } : t
+          )
+        );
+      } else if (event.type === "task_message") {
+        setTasks((prev) =>
+          prev.map((t) => {
+            if (t.id !== event.task_id) return t;
+            const messages = t.messages || [];
+            if (containsMessage(messages, event.message.id)) return t;
+
+            const msg = { ...event.message, replies: [] };
+            return {
+              ...t,
+              message_count: (t.message_count || 0) + 1,
+              messages: !t.threadLoaded
+                ? messages
+                : msg.parentId
+                ? addReplyToMessage(messages, msg.parentId, msg)
+                : [...messages, msg],
+            };
+          })
+        );
+      } else if (event.type === "task_message_edited") {
+        setTasks((prev) =>
+          prev.map((t) =>
+            t.id === event.task_id
+              ? { ...t, messages: editMessage(t.messages || [], event.message) }
+              : t
+          )
+        );
+      }
     });
+    // eslint-disable-next-line react-hooks/exhaustive-deps
+  }, []);
+
+  /* load the selected task's thread; /tasks only carries message counts */
+  useEffect(() => {
+    if (!selectedTaskId) return;
+    const task = tasks.find((t) => t.id === selectedTaskId);
+    if (!task || task.threadLoaded) return;
+
+    const loadThread = async () => {
+      try {
+        const flat = [];
+        let after = null;
+        do {
+          const res = await api.get(`/tasks/${selectedTaskId}/thread`, {
+            params: after ? { after } : {},
+          });
+          flat.push(...res.data.messages);
+          after = res.data.next_cursor;
+        } while (after);
+
+        // Rows arrive depth-first, so every parent precedes its replies
+        const byId = {};
+        const roots = [];
+        for (const msg of flat) {
+          const node = { ...msg, replies: [] };
+          byId[node.id] = node;
+          if (node.parentId && byId[node.parentId]) {
+            byId[node.parentId].replies.push(node);
+          } else {
+            roots.push(node);
+          }
+        }
 
-    const payload = {
-      title: task.title,
-      status: task.status,
-      messages: (task.messages || []).map(convertMessageFormat),
+        setTasks((prev) =>
+          prev.map((t) =>
+            t.id === selectedTaskId
+              ? { ...t, messages: roots, threadLoaded: true }
+              : t
+          )
+        );
+      } catch (err) {
+        console.error("Thread fetch failed", err);
+      }
     };
+    loadThread();
+  }, [selectedTaskId, tasks]);
 
-    try {
-      const response = await api.put(`/tasks/${task.id}`, payload);
-      return response.data;
-    } catch (error) {
-      console.error(
-        "Update error details:",
-        error.response?.data || error.message
-      );
-      throw error;
-    }
+  /* Create Task in DB*/
+  const createTaskInDB = async (task) => {
+    const res = await api.post("/tasks", task);
+    return res.data;
   };
 
   const createTask = async () => {
@@ -119,7 +197,9 @@ export default function CollaborativeTaskManager() {
 
     try {
       const createdTask = await createTaskInDB(taskToCreate);
-      setTasks((prev) => [...prev, createdTask]);
+      setTasks((prev) =>
+        prev.some((t) => t.id === createdTask.id) ? prev : [...prev, createdTask]
+      );
       setNewTaskTitle("");
       setShowCreateTask(false);
       setSelectedTaskId(createdTask.id);
@@ -140,7 +220,9 @@ export default function CollaborativeTaskManager() {
     setTasks((prev) => prev.map((t) => (t.id === taskId ? updatedTask : t)));
 
     try {
-      await updateTaskInDB(updatedTask);
+      await api.patch(`/tasks/${taskId}/status`, {
+        status: updatedTask.status,
+      });
     } catch (err) {
       console.error("Failed to update task status:", err);
       setTasks((prev) => prev.map((t) => (t.id === taskId ? task : t)));
@@ -331,6 +413,8 @@ export default function CollaborativeTaskManager() {
       messages: updatedMessages,
       created_at: selectedTask.created_at,
       mentioned_users: selectedTask.mentioned_users || [],
+      message_count: (selectedTask.message_count || 0) + 1,
+      threadLoaded: selectedTask.threadLoaded,
     };
 
     setTasks((prev) =>
@@ -345,8 +429,12 @@ export default function CollaborativeTaskManager() {
     setMentionPosition(undefined);
 
     try {
-      const result = await updateTaskInDB(updatedTask);
-      setTasks((prev) => prev.map((t) => (t.id === result.id ? result : t)));
+      // Only the new message is sent; the server appends it in place
+      await api.post(`/tasks/${selectedTask.id}/messages`, {
+        id: newMsg.id,
+        text: newMsg.text,
+        parentId: newMsg.parentId,
+      });
     } catch (err) {
       console.error("Failed to update task:", err);
       try {
@@ -650,7 +738,7 @@ export default function CollaborativeTaskManager() {
                     >
                       {task.status}
                     </span>
-                    {task.messages && task.messages.length > 0 && (
+                    {task.message_count > 0 && (
                       <>
                         <span
                           className={`${
@@ -665,7 +753,7 @@ export default function CollaborativeTaskManager() {
                           }`}
                         >
                           <MessageSquare size={12} />
-                          {task.messages.length}
+                          {task.message_count}
                         </span>
                       </>
                     )}
@@ -1,5 +1,6 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import api from "../api";
+import { subscribe } from "../realtime";
 import { useAuth } from "../contexts/AuthContext";
 import { useTheme } from "../contexts/ThemeContext";
 
@@ -11,9 +12,85 @@ function Messages() {
   const [conversations, setConversations] = useState([]);
   const [selectedUser, setSelectedUser] = useState(null);
   const [messages, setMessages] = useState([]);
+  const [olderCursor, setOlderCursor] = useState(null);
+  const [loadingOlder, setLoadingOlder] = useState(false);
   const [replyText, setReplyText] = useState("");
   const [sending, setSending] = useState(false);
 
+  const selectedUserRef = useRef(null);
+  selectedUserRef.current = selectedUser;
+  const messagesRef = useRef([]);
+  messagesRef.current = messages;
+
+  /* after a reconnect, pull the open conversation's latest page to fill the gap */
+  const reloadLatestPage = async () => {
+    const peer = selectedUserRef.current;
+    if (!peer) return;
+
+    try {
+      const res = await api.get(`/messages/${peer._id}`);
+      if (selectedUserRef.current?._id !== peer._id) return;
+
+      const page = res.data.messages;
+      const fresh = new Set(page.map((m) => m._id));
+      const loaded = messagesRef.current;
+
+      if (!page.length || !loaded.some((m) => fresh.has(m._id))) {
+        // more than a page was missed (or nothing was loaded): start over from the new page
+        setMessages(page);
+        setOlderCursor(res.data.next_cursor);
+        return;
+      }
+      // keep the older history already loaded, then the refreshed latest page
+      const older = loaded.filter(
+        (m) => !fresh.has(m._id) && m.created_at < page[0].created_at
+      );
+      setMessages([...older, ...page]);
+    } catch (err) {
+      console.error("Failed to reload messages", err);
+    }
+  };
+
+  /* new messages are pushed over the WebSocket instead of re-fetched */
+  useEffect(() => {
+    if (!currentUser) return;
+
+    return subscribe((event) => {
+      if (event.type === "reconnected") {
+        api.get("/messages/conversations").then((res) => setConversations(res.data));
+        reloadLatestPage();
+        return;
+      }
+      if (event.type !== "message") return;
+
+      const msg = event.message;
+      const peerId = msg.sender_id === currentUser.id ? msg.receiver_id : msg.sender_id;
+      const open = selectedUserRef.current?._id === peerId;
+      const incoming = msg.sender_id !== currentUser.id;
+
+      if (open) {
+        setMessages((prev) =>
+          prev.some((m) => m._id === msg._id) ? prev : [...prev, msg]
+        );
+      }
+
+      setConversations((prev) => {
+        const existing = prev.find((c) => c._id === peerId);
+        const updated = {
+          _id: peerId,
+          name: existing?.name || (incoming ? msg.sender_name : "?"),
+          ...existing,
+          last_message: msg.content.substring(0, 100),
+          last_message_at: msg.created_at,
+          last_sender_id: msg.sender_id,
+          unread_count:
+            (existing?.unread_count || 0) + (incoming && !open ? 1 : 0),
+        };
+        return [updated, ...prev.filter((c) => c._id !== peerId)];
+      });
+    });
+  }, [currentUser]);
+
   useEffect(() => {
     const fetchConversations = async () => {
       try {
@@ -32,7 +109,8 @@ function Messages() {
     const fetchMessages = async () => {
       try {
         const res = await api.get(`/messages/${selectedUser._id}`);
-        setMessages(res.data);
+        setMessages(res.data.messages);
+        setOlderCursor(res.data.next_cursor);
       } catch (err) {
         console.error("Failed to load messages", err);
       }
@@ -41,17 +119,37 @@ function Messages() {
     fetchMessages();
   }, [selectedUser]);
 
+  const loadOlder = async () => {
+    if (!olderCursor || loadingOlder) return;
+
+    setLoadingOlder(true);
+    try {
+      const res = await api.get(`/messages/${selectedUser._id}`, {
+        params: { before: olderCursor },
+      });
+      setMessages((prev) => [...res.data.messages, ...prev]);
+      setOlderCursor(res.data.next_cursor);
+    } catch (err) {
+      console.error("Failed to load older messages", err);
+    } finally {
+      setLoadingOlder(false);
+    }
+  };
+
   const sendReply = async () => {
     if (!replyText.trim() || !selectedUser) return;
 
-    await api.post("/messages", {
+    const res = await api.post("/messages", {
       receiver_id: selectedUser._id,
       content: replyText.trim(),
     });
 
     setReplyText("");
-    const res = await api.get(`/messages/${selectedUser._id}`);
-    setMessages(res.data);
+    setMessages((prev) =>
+      prev.some((m) => m._id === res.data._id)
+        ? prev
+        : [...prev, { ...res.data, sender_name: currentUser.name }]
+    );
   };
 
   const capitalize = (str) => {
@@ -72,7 +170,12 @@ function Messages() {
   {conversations.map((user) => (
     <div
       key={user._id}
-      onClick={() => setSelectedUser(user)}
+      onClick={() => {
+        setSelectedUser(user);
+        setConversations((prev) =>
+          prev.map((c) => (c._id === user._id ? { ...c, unread_count: 0 } : c))
+        );
+      }}
       className={`p-6 rounded-xl shadow-lg hover:shadow-xl border transition cursor-pointer
         ${
           theme === "dark"
@@ -104,13 +207,19 @@ function Messages() {
           </h3>
 
           <p
-            className={`text-sm ${
+            className={`text-sm truncate ${
               theme === "dark" ? "text-gray-400" : "text-gray-500"
             }`}
           >
-            Click to view messages
+            {user.last_message || "Click to view messages"}
           </p>
         </div>
+
+        {user.unread_count > 0 && (
+          <span className="ml-auto min-w-[1.5rem] h-6 px-2 rounded-full bg-indigo-600 text-white text-xs font-semibold flex items-center justify-center">
+            {user.unread_count}
+          </span>
+        )}
       </div>
     </div>
   ))}
@@ -156,6 +265,24 @@ function Messages() {
       }
     `}
   >
+    {olderCursor && (
+      <div className="flex justify-center">
+        <button
+          onClick={loadOlder}
+          disabled={loadingOlder}
+          className={`px-3 py-1 rounded-lg text-xs transition
+            ${
+              theme === "dark"
+                ? "bg-gray-700 hover:bg-gray-600 text-gray-200"
+                : "bg-gray-200 hover:bg-gray-300 text-gray-700"
+            }
+          `}
+        >
+          {loadingOlder ? "Loading..." : "Load older messages"}
+        </button>
+      </div>
+    )}
+
     {messages.map((msg) => {
       const isMe = msg.sender_id === currentUser.id;
 
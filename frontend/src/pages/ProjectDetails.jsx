@@ -74,6 +74,18 @@ function ProjectDetails() {
     fetchProject();
   }, [loading, currentUser, projectId]);
 
+  // The project payload only carries note summaries; bodies are fetched on demand
+  const loadNote = async (note) => {
+    const res = await api.get(`/projects/${projectId}/notes/${note.id}`);
+    return res.data;
+  };
+
+  const toSummary = ({ title, body }) => ({
+    title,
+    preview: body.substring(0, 100),
+    truncated: body.length > 100,
+  });
+
   const saveNote = async () => {
     if (!noteTitle.trim() || !newNote.trim()) return;
 
@@ -90,14 +102,14 @@ function ProjectDetails() {
           ...prev,
           notes: prev.notes.map((n) =>
             n.id === editingIndex
-              ? { ...n, ...notePayload, createdAt: new Date().toLocaleString() }
+              ? { ...n, ...toSummary(notePayload), createdAt: new Date().toLocaleString() }
               : n
           ),
         }));
       } else {
         const res = await api.post(`/projects/${projectId}/notes`, notePayload);
         const newNoteObj = {
-          ...notePayload,
+          ...toSummary(notePayload),
           createdAt: new Date().toLocaleString(),
           id: res.data.note_id,
         };
@@ -429,18 +441,30 @@ function ProjectDetails() {
         : "border-gray-200 bg-white hover:border-indigo-300"
     }
   `}
-                  onClick={(e) => {
-                    if (e.ctrlKey || e.metaKey) {
+                  onClick={async (e) => {
+                    if ((e.ctrlKey || e.metaKey) && isSelected) {
                       setSelectedNotes((prev) =>
-                        prev.some((n) => n.id === note.id)
-                          ? prev.filter((n) => n.id !== note.id)
-                          : [...prev, note]
+                        prev.filter((n) => n.id !== note.id)
                       );
                       return;
                     }
 
-                    setNoteTitle(note.title);
-                    setNewNote(note.body);
+                    const multiSelect = e.ctrlKey || e.metaKey;
+                    let fullNote;
+                    try {
+                      fullNote = await loadNote(note);
+                    } catch (err) {
+                      console.error("Failed to load note", err);
+                      return;
+                    }
+
+                    if (multiSelect) {
+                      setSelectedNotes((prev) => [...prev, fullNote]);
+                      return;
+                    }
+
+                    setNoteTitle(fullNote.title);
+                    setNewNote(fullNote.body);
                     setEditingIndex(note.id);
                     setShowModal(true);
                   }}
@@ -459,9 +483,7 @@ function ProjectDetails() {
                       theme === "dark" ? "text-gray-400" : "text-gray-600"
                     }`}
                   >
-                    {note.body.length > 100
-                      ? note.body.substring(0, 100) + " ..."
-                      : note.body}
+                    {note.truncated ? note.preview + " ..." : note.preview}
                   </p>
 
                   <span
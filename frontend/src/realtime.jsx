@@ -0,0 +1,45 @@
+import api from "./api";
+
+// One shared WebSocket for every subscriber; reconnects with backoff while anyone listens
+const listeners = new Set();
+let socket = null;
+let retries = 0;
+
+function connect() {
+  const token = localStorage.getItem("token");
+  if (!token) return;
+
+  // the token goes in the first frame, not the URL, so it stays out of access logs
+  socket = new WebSocket(`${api.defaults.baseURL.replace(/^http/, "ws")}/ws`);
+
+  socket.onopen = () => {
+    socket.send(JSON.stringify({ type: "auth", token }));
+    // anything pushed while disconnected was missed, so let subscribers resync
+    if (retries > 0) listeners.forEach((listener) => listener({ type: "reconnected" }));
+    retries = 0;
+  };
+
+  socket.onmessage = (e) => {
+    const event = JSON.parse(e.data);
+    listeners.forEach((listener) => listener(event));
+  };
+
+  socket.onclose = () => {
+    socket = null;
+    if (listeners.size > 0) {
+      setTimeout(connect, Math.min(1000 * 2 ** retries++, 30000));
+    }
+  };
+}
+
+export function subscribe(listener) {
+  listeners.add(listener);
+  if (!socket) connect();
+
+  return () => {
+    listeners.delete(listener);
+    if (listeners.size === 0 && socket) {
+      socket.close();
+    }
+  };
+}